@@ -1,7 +1,10 @@
 # Home.py (Main Entry)
 # -*- coding: utf-8 -*-
+import os
 import streamlit as st
-from datetime import datetime
+from datetime import date, datetime
+# Only stdlib metadata here: the landing page never imports pandas or reads the CSV
+from manifest import ARROW_DATASET_ENV, DATA_FILE, DATA_SOURCE_ENV, read_manifest
 
 # Config - Set first
 st.set_page_config(
@@ -240,15 +243,32 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Metrics Overview
+# Metrics Overview, from the manifest written when the data was last ingested
+manifest = read_manifest(
+    os.environ.get(ARROW_DATASET_ENV) or os.environ.get(DATA_SOURCE_ENV) or DATA_FILE
+)
 col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Total States Covered", "36", help="Includes all states/UTs")
-with col2:
-    st.metric("Data Timeframe", "2020-2021", help="Jan 2020 - Dec 2021")
-with col3:
-    st.metric("Last Updated", datetime.now().strftime(
-        "%d %b %Y"), help="Auto-refreshes daily")
+if manifest and manifest.get('date_start'):
+    start = date.fromisoformat(manifest['date_start'])
+    end = date.fromisoformat(manifest['date_end'])
+    with col1:
+        st.metric("Total States Covered", f"{manifest['states']}",
+                  help=f"Includes all states/UTs; {manifest['rows']:,} daily records")
+    with col2:
+        st.metric("Data Timeframe", f"{start.year}-{end.year}",
+                  help=f"{start:%d %b %Y} - {end:%d %b %Y}")
+    with col3:
+        st.metric("Last Updated", datetime.fromtimestamp(manifest['source_mtime']).strftime(
+            "%d %b %Y"), help="When the source data file was last modified")
+else:
+    with col1:
+        st.metric("Total States Covered", "—", help="Includes all states/UTs")
+    with col2:
+        st.metric("Data Timeframe", "—")
+    with col3:
+        st.metric("Last Updated", "—")
+    st.caption("Open the Trend Analysis or Data Explorer page to load the data; "
+               "these figures are filled in after the first load.")
 
 # Features Grid
 st.subheader("🚀 Key Features")
@@ -0,0 +1,155 @@
+# batch_report.py
+"""Build per-state summary reports for every state in one zip bundle.
+
+Usage:
+    python batch_report.py --output reports/covid_report.zip --top 10
+    python batch_report.py --start 2021-01-01 --end 2021-06-30 --workers 8
+
+Each state's Explorer stats summary, monthly aggregation and top-N positive
+days are computed across a process pool; the overall dataset summary and a
+manifest are written alongside them.
+"""
+import argparse
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import data_core
+from diagnostics import start_run, stage
+
+TOP_DAY_COLUMNS = ['Date', 'TotalSamples', 'Positive', 'Negative', 'PositiveRatio']
+
+
+def _json_default(value: Any) -> Any:
+    """Encode the numpy scalars found in summaries as plain Python numbers"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _to_json(payload: Any) -> str:
+    return json.dumps(payload, indent=2, default=_json_default)
+
+
+def state_slug(state: str) -> str:
+    """File-system friendly folder name for a state"""
+    return re.sub(r'[^A-Za-z0-9]+', '_', state).strip('_')
+
+
+def state_report(state: str, rows: pd.DataFrame, date_range: Tuple[date, date],
+                 top_n: int) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """Stats summary plus serialised report files for one state's filtered rows"""
+    stats = data_core.stats_summary(rows, state, date_range)
+    monthly = data_core.aggregate_by_month(rows, state, date_range)
+    top_days = rows.nlargest(top_n, 'Positive')[TOP_DAY_COLUMNS]
+    folder = f"states/{state_slug(state)}"
+    files = {
+        f"{folder}/stats.json": _to_json(stats),
+        f"{folder}/monthly.csv": monthly.to_csv(index=False),
+        f"{folder}/top_days.csv": top_days.to_csv(index=False, date_format='%Y-%m-%d'),
+    }
+    return state, stats, files
+
+
+def _state_report_args(args: Tuple) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    return state_report(*args)
+
+
+def build_reports(df: pd.DataFrame, date_range: Tuple[date, date], top_n: int,
+                  workers: int) -> List[Tuple[str, Dict[str, Any], Dict[str, str]]]:
+    """Report every state with data in `date_range`, fanned out over `workers` processes"""
+    index = data_core.StateIndex(df)
+    jobs = []
+    for state in index.states():
+        rows = data_core.filter_data(df, [state], date_range, index=index)
+        if not rows.empty:
+            jobs.append((state, rows, date_range, top_n))
+    if workers <= 1:
+        return [state_report(*job) for job in jobs]
+    # Batch several states per task so process overhead stays small
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_state_report_args, jobs, chunksize=chunksize))
+
+
+def write_bundle(path: str, df: pd.DataFrame, source: str, date_range: Tuple[date, date],
+                 reports: List[Tuple[str, Dict[str, Any], Dict[str, str]]]) -> None:
+    """Write every report, the summary of `df` and a manifest into one zip, atomically"""
+    all_stats = pd.DataFrame([stats for _, stats, _ in reports])
+    files = {
+        'summary.json': _to_json(data_core.get_data_summary(df)),
+        'all_states_stats.csv': all_stats.to_csv(index=False),
+    }
+    for _, _, state_files in reports:
+        files.update(state_files)
+    manifest = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'source': os.path.abspath(source),
+        'pipeline_version': data_core.PIPELINE_VERSION,
+        'date_range': [str(d) for d in date_range],
+        'states': [state for state, _, _ in reports],
+        'files': sorted(files),
+    }
+    files['manifest.json'] = _to_json(manifest)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            for name in sorted(files):
+                bundle.writestr(name, files[name])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _parse_date(value: Optional[str], default: pd.Timestamp) -> date:
+    return date.fromisoformat(value) if value else default.date()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=data_core.DATA_FILE,
+                        help="Source CSV, or a directory or glob of snapshot CSVs")
+    parser.add_argument('--output', default=f"reports/covid_report_{date.today():%Y%m%d}.zip",
+                        help="Zip bundle to write")
+    parser.add_argument('--start', help="First date (YYYY-MM-DD), defaults to the first in the data")
+    parser.add_argument('--end', help="Last date (YYYY-MM-DD), defaults to the last in the data")
+    parser.add_argument('--top', type=int, default=10, help="Top positive days per state")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (1 runs in-process)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    start_run('batch_report')
+    with stage('batch.load') as timing:
+        df = data_core.load_frame(args.source)
+        timing['rows'] = len(df)
+    if df.empty:
+        parser.error(f"no rows loaded from {args.source}")
+    date_range = (_parse_date(args.start, df['Date'].min()),
+                  _parse_date(args.end, df['Date'].max()))
+
+    with stage('batch.reports') as timing:
+        reports = build_reports(df, date_range, args.top, args.workers)
+        timing['rows'] = len(reports)
+    with stage('batch.write', len(reports)):
+        window = data_core.filter_data(df, None, date_range)
+        write_bundle(args.output, window, args.source, date_range, reports)
+
+    print(f"{len(reports)} states, {date_range[0]} to {date_range[1]} -> {args.output} "
+          f"({time.perf_counter() - started:.2f} s, {args.workers} workers)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# benchmarks/bench_data_layer.py
+"""Time the data layer behind the dashboard pages at several dataset scales.
+
+Usage:
+    python benchmarks/bench_data_layer.py --scales 1 10 100 --output results.json
+    python benchmarks/bench_data_layer.py --baseline baseline.json
+
+Every case runs against the bundled CSV and against synthetic data, where
+1x is 36 states over two years and Nx adds N synthetic districts per state.
+Wall time is the best of `--repeat` runs; peak memory is measured with
+tracemalloc in a separate run (allocations made inside pyarrow are not seen).
+Results are written as JSON; with `--baseline` each case is compared against
+a previous results file and the run exits non-zero on a regression.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_core  # noqa: E402
+
+
+def bundled_csv(directory: str) -> str:
+    """Copy the bundled CSV into `directory` so its cache stays out of the tree"""
+    path = os.path.join(directory, 'bundled.csv')
+    shutil.copyfile(os.path.join(os.path.dirname(data_core.__file__), data_core.DATA_FILE), path)
+    return path
+
+
+def synthetic_csv(scale: int, directory: str, seed: int) -> str:
+    """Write a synthetic CSV at `scale` (1x = one series per state) and return its path"""
+    df = data_core.create_sample_data(
+        days=730, states=36, districts=scale if scale > 1 else 0, seed=seed
+    )
+    path = os.path.join(directory, f"synthetic_x{scale}.csv")
+    df[['Date', 'State'] + data_core.NUMERIC_COLUMNS].to_csv(
+        path, index=False, date_format='%Y-%m-%d'
+    )
+    return path
+
+
+def query_window(df: pd.DataFrame, index: data_core.StateIndex) -> Tuple[List[str], tuple]:
+    """A typical page query: ten states over the middle half of the data"""
+    states = index.states()[:10]
+    start, end = df['Date'].min(), df['Date'].max()
+    quarter = (end - start) / 4
+    return states, ((start + quarter).date(), (end - quarter).date())
+
+
+def build_cases(path: str) -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, callable) pairs for every benchmarked operation on one dataset"""
+    cache = data_core._cache_path(path)
+
+    def load_cold():
+        if os.path.exists(cache):
+            os.remove(cache)
+        return data_core.load_frame(path)
+
+    df = data_core.load_frame(path)
+    index = data_core.StateIndex(df)
+    cube = data_core.RollupCube(df)
+    states, date_range = query_window(df, index)
+    state = states[0]
+    state_rows = data_core.filter_data(df, [state], date_range, index=index)
+
+    return [
+        ('load_data (cold)', load_cold),
+        ('load_data (cached)', lambda: data_core.load_frame(path)),
+        ('filter_data', lambda: data_core.filter_data(df, states, date_range, index=index)),
+        ('get_data_summary', lambda: data_core.get_data_summary(df)),
+        ('comparison (cube build)', lambda: data_core.RollupCube(df)),
+        ('comparison', lambda: data_core.aggregate_by_state(
+            df, states, date_range, 'Positive', cube=cube, index=index)),
+        ('export csv', lambda: data_core.serialize_export(state_rows, 'csv')),
+        ('export json', lambda: data_core.serialize_export(state_rows, 'json')),
+        ('export stats', lambda: data_core.serialize_export(state_rows, 'stats', state, date_range)),
+        ('bulk export csv.gz', lambda: data_core.write_bulk_export(
+            df, 'csv.gz', io.BytesIO(), index=index)),
+    ]
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Best wall time over `repeat` runs and the peak traced memory of one run"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'peak_mb': peak / 1e6}
+
+
+def run(datasets: List[Tuple[str, str]], repeat: int) -> List[Dict[str, Any]]:
+    """Benchmark every case on every dataset"""
+    results = []
+    for name, path in datasets:
+        cases = build_cases(path)
+        rows = len(data_core.load_frame(path))
+        for case, func in cases:
+            result = {'dataset': name, 'rows': rows, 'case': case, **measure(func, repeat)}
+            results.append(result)
+            print(f"{name:>14} {rows:>10,} {case:<26} "
+                  f"{result['seconds'] * 1000:10.1f} ms {result['peak_mb']:9.1f} MB")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str,
+            threshold: float, min_delta: float) -> int:
+    """Print each case against the baseline; returns the number of regressions
+
+    A case regresses when it is both `threshold` times slower and at least
+    `min_delta` seconds slower, so sub-millisecond jitter is not reported.
+    """
+    with open(baseline_path) as fh:
+        baseline = {(r['dataset'], r['case']): r for r in json.load(fh)['results']}
+    regressions = 0
+    print(f"\nagainst {baseline_path} (regression above {threshold:.2f}x):")
+    for result in results:
+        before = baseline.get((result['dataset'], result['case']))
+        if before is None or before['seconds'] <= 0:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        slower = result['seconds'] - before['seconds']
+        flag = 'REGRESSION' if ratio > threshold and slower >= min_delta else ''
+        regressions += bool(flag)
+        print(f"{result['dataset']:>14} {result['case']:<26} "
+              f"{before['seconds'] * 1000:10.1f} -> {result['seconds'] * 1000:10.1f} ms "
+              f"{ratio:6.2f}x {flag}")
+    return regressions
+
+
+def environment() -> Dict[str, Any]:
+    """Versions and host details recorded alongside the results"""
+    try:
+        import pyarrow
+        arrow_version = pyarrow.__version__
+    except ImportError:
+        arrow_version = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': arrow_version,
+        'csv_engine': data_core._csv_engine(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='*', default=[1, 10, 100],
+                        help="Synthetic dataset scales to run")
+    parser.add_argument('--no-bundled', action='store_true', help="Skip the bundled CSV")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case (best is reported)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic data")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previous results file")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Slowdown ratio reported as a regression")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datasets = [] if args.no_bundled else [('bundled', bundled_csv(tmp))]
+        datasets += [(f"synthetic-{s}x", synthetic_csv(s, tmp, args.seed)) for s in args.scales]
+        results = run(datasets, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({'environment': environment(), 'results': results}, fh, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.baseline and compare(results, args.baseline, args.threshold,
+                                     args.min_delta_ms / 1000):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_engines.py
+"""Compare the query engines on the page queries and check they agree.
+
+Usage:
+    python benchmarks/bench_engines.py --scales 1 10 100 --repeat 5
+
+Each engine runs the Trend page filter, the State Comparison aggregation, the
+Explorer's monthly aggregation and the dataset summary on synthetic data (1x is 36 states over
+two years, Nx adds N districts per state). Results are checked against the
+pandas engine before anything is timed; engines whose optional package is
+not installed are skipped.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_core  # noqa: E402
+from duckdb_engine import DuckDBEngine  # noqa: E402
+from polars_engine import PolarsEngine  # noqa: E402
+
+
+def build_engines(df: pd.DataFrame, directory: str) -> Dict[str, Any]:
+    """Every available engine over the same data, keyed by a display name"""
+    dataset = data_core.Dataset(df)
+    engines = {'pandas': data_core.PandasEngine(dataset)}
+    parquet_file = os.path.join(directory, 'dataset.parquet')
+    arrow_file = os.path.join(directory, 'dataset.arrow')
+    df.to_parquet(parquet_file, index=False)
+    data_core.write_dataset(df, arrow_file, parquet_file)
+    try:
+        engines['duckdb (frame)'] = DuckDBEngine(dataset.view())
+        engines['duckdb (parquet)'] = DuckDBEngine(parquet_file)
+        engines['duckdb (arrow)'] = DuckDBEngine(arrow_file)
+    except ImportError as e:
+        print(f"skipping DuckDB: {e}")
+    try:
+        engines['polars (frame)'] = PolarsEngine(dataset.view())
+        engines['polars (parquet)'] = PolarsEngine(parquet_file)
+        engines['polars (arrow)'] = PolarsEngine(arrow_file)
+    except ImportError as e:
+        print(f"skipping Polars: {e}")
+    return engines
+
+
+def page_queries(df: pd.DataFrame) -> List[Tuple[str, Callable[[Any], pd.DataFrame]]]:
+    """(name, query) pairs: ten states over the middle half of the data"""
+    states = sorted(df['State'].cat.categories)[:10]
+    start, end = df['Date'].min(), df['Date'].max()
+    quarter = (end - start) / 4
+    date_range = ((start + quarter).date(), (end - quarter).date())
+    return [
+        ('filter', lambda engine: engine.filter_data(states, date_range)),
+        ('comparison', lambda engine: engine.aggregate_by_state(states, date_range, 'Positive')),
+        ('monthly', lambda engine: engine.aggregate_by_month(states[0], date_range)),
+        ('summary', lambda engine: engine.summary(states, date_range)),
+    ]
+
+
+def assert_same(result: Any, expected: Any, query: str) -> None:
+    """Fail unless an engine's result matches the pandas engine's"""
+    if query == 'filter':
+        pd.testing.assert_frame_equal(result, expected, check_index_type=False)
+        return
+    if isinstance(expected, dict):
+        result, expected = pd.json_normalize(result), pd.json_normalize(expected)
+    # Float sums may differ in the last bits between engines
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-6)
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time in seconds over `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='*', default=[1, 10, 100],
+                        help="Synthetic dataset scales to run")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per query (best is reported)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic data")
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        df = data_core.create_sample_data(
+            days=730, states=36, districts=scale if scale > 1 else 0, seed=args.seed
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            engines = build_engines(df, tmp)
+            for query, run in page_queries(df):
+                expected = run(engines['pandas'])
+                for name, engine in engines.items():
+                    result = run(engine)
+                    assert_same(result, expected, query)
+                    seconds = best_of(lambda: run(engine), args.repeat)
+                    print(f"x{scale:<4} {len(df):>10,} {query:<11} {name:<17} "
+                          f"{seconds * 1000:9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_ingest.py
+"""Compare the legacy string round-trip ingest with the typed ingest path.
+
+Usage:
+    python benchmarks/bench_ingest.py --scale 50 --repeat 3
+    python benchmarks/bench_ingest.py --scale 50 --snapshots --workers 16
+
+The bundled CSV is replicated `scale` times (each copy under distinct
+synthetic district names) to approximate district-level volumes. With
+--snapshots it is also split into one CSV per day, and loading that directory
+serially is compared with loading it over a process pool.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_core  # noqa: E402
+
+
+def build_scaled_csv(scale: int, directory: str) -> str:
+    """Write the bundled CSV replicated `scale` times and return its path"""
+    source = pd.read_csv(os.path.join(os.path.dirname(data_core.__file__), data_core.DATA_FILE),
+                         dtype=str, keep_default_na=False)
+    copies = []
+    for i in range(scale):
+        copy = source.copy()
+        copy['State'] = copy['State'] + f" District {i:03d}"
+        copies.append(copy)
+    path = os.path.join(directory, f"statewise_x{scale}.csv")
+    pd.concat(copies, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def split_daily(path: str, directory: str) -> str:
+    """Write one snapshot CSV per day of `path` into a new directory and return it"""
+    source = pd.read_csv(path, dtype=str, keep_default_na=False)
+    snapshots = os.path.join(directory, 'daily')
+    os.makedirs(snapshots)
+    for day, rows in source.groupby('Date', sort=False):
+        rows.to_csv(os.path.join(snapshots, f"{day}.csv"), index=False)
+    return snapshots
+
+
+def bench_snapshots(path: str, directory: str, workers: int, repeat: int) -> None:
+    """Time serial and parallel loads of the per-day snapshots of `path`"""
+    snapshots = split_daily(path, directory)
+    files = data_core.snapshot_files(snapshots)
+    expected = data_core._read_source(path)
+    serial = data_core._merge_snapshots(data_core._read_snapshots(files, workers=1))
+    parallel = data_core._merge_snapshots(data_core._read_snapshots(files, workers=workers))
+    pd.testing.assert_frame_equal(serial, expected)
+    pd.testing.assert_frame_equal(parallel, expected)
+
+    serial_time = best_of(lambda: data_core._read_snapshots(files, workers=1), repeat)
+    parallel_time = best_of(lambda: data_core._read_snapshots(files, workers=workers), repeat)
+    print(f"snapshots: {len(files):,} daily files")
+    print(f"serial load:   {serial_time * 1000:8.1f} ms")
+    print(f"parallel load: {parallel_time * 1000:8.1f} ms  "
+          f"({serial_time / parallel_time:.1f}x, {workers} workers)")
+
+
+def best_of(func, repeat: int) -> float:
+    """Best wall time in seconds over `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=20, help="Copies of the bundled CSV")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per path (best is reported)")
+    parser.add_argument('--snapshots', action='store_true',
+                        help="Also compare serial and parallel loads of per-day snapshot files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for the parallel snapshot load")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_scaled_csv(args.scale, tmp)
+        legacy = data_core._read_source(path, typed=False)
+        typed = data_core._read_source(path, typed=True)
+        pd.testing.assert_frame_equal(legacy, typed)
+
+        legacy_time = best_of(lambda: data_core._read_source(path, typed=False), args.repeat)
+        typed_time = best_of(lambda: data_core._read_source(path, typed=True), args.repeat)
+
+        print(f"rows: {len(typed):,} (x{args.scale}), engine: {data_core._csv_engine()}")
+        print(f"legacy ingest: {legacy_time * 1000:8.1f} ms")
+        print(f"typed ingest:  {typed_time * 1000:8.1f} ms  ({legacy_time / typed_time:.1f}x faster)")
+        if args.snapshots:
+            bench_snapshots(path, tmp, args.workers, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1898 @@
+# data_core.py
+"""Loading, cleaning, filtering and summary logic with no Streamlit dependency
+
+Batch jobs, benchmarks and workers import this module directly; utils.py
+wraps it with Streamlit caching and user-facing messages for the pages.
+"""
+import pandas as pd
+import numpy as np
+import errno
+import glob
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from datetime import date, datetime
+from typing import Tuple, List, Dict, Any, Optional, Iterator, BinaryIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnostics import RECORDER, record_timings, stage
+from manifest import DATA_FILE, is_glob, manifest_path, source_stem, write_manifest
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pyarrow ships with streamlit, but keep the cache optional
+    pa = None
+
+# Bump whenever the cleaning pipeline changes so stale on-disk caches are rebuilt
+PIPELINE_VERSION = 5
+
+CACHE_KEY_FIELD = b'covid_cache_key'
+
+
+NA_VALUES = ['', 'None', 'none', 'NONE',
+             'null', 'NULL', 'NaN', 'nan', ' ', '-', 'NA']
+
+NUMERIC_COLUMNS = ['TotalSamples', 'Negative', 'Positive']
+
+# PositiveRatio is rounded to this many decimals and stored as float32
+RATIO_DECIMALS = 4
+
+# name -> (bit, label) of the data-quality flags stored per row in the uint8
+# Quality column; cleaning fills and clips values, the flags record where
+QUALITY_FLAGS = {
+    'negative_missing': (1, "Negative missing"),
+    'samples_missing': (2, "TotalSamples missing"),
+    'positive_missing': (4, "Positive missing"),
+    'samples_decrease': (8, "TotalSamples decreased"),
+    'positive_decrease': (16, "Positive decreased"),
+    'count_mismatch': (32, "Positive + Negative ≠ TotalSamples"),
+    'clipped': (64, "Count below 0, clipped to 0"),
+}
+
+# Missing-value flag of each count column
+MISSING_FLAGS = {
+    'TotalSamples': QUALITY_FLAGS['samples_missing'][0],
+    'Positive': QUALITY_FLAGS['positive_missing'][0],
+    'Negative': QUALITY_FLAGS['negative_missing'][0],
+}
+
+# Flags that depend on the previous report of the same state
+SEQUENCE_FLAGS = {
+    'TotalSamples': QUALITY_FLAGS['samples_decrease'][0],
+    'Positive': QUALITY_FLAGS['positive_decrease'][0],
+}
+
+# Rename columns to standard format
+COLUMN_MAPPING = {
+    'State': 'State',
+    'Date': 'Date',
+    'TotalSamples': 'TotalSamples',
+    'Negative': 'Negative',
+    'Positive': 'Positive',
+    'positive': 'Positive',
+    'negative': 'Negative',
+    'totalsamples': 'TotalSamples',
+    'state': 'State',
+    'date': 'Date',
+    'total': 'TotalSamples'
+}
+
+
+def _standard_column_name(col: str) -> str:
+    """Map a raw CSV header to the standard column name"""
+    normalized = str(col).strip().replace(' ', '').replace('-', '')
+    return COLUMN_MAPPING.get(normalized, normalized)
+
+
+def _count_dtype(values: pd.Series) -> type:
+    """Narrowest integer dtype that holds the counts and their differences safely"""
+    peak = values.max()
+    if pd.isna(peak) or peak <= np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+def _clean_raw_frame(df: pd.DataFrame, typed: bool = True) -> pd.DataFrame:
+    """Apply the standard cleaning pipeline to a freshly parsed CSV frame
+
+    With ``typed`` set, numeric columns that the parser already read as numbers
+    skip the string round-trip; only columns holding text are scrubbed.
+    """
+    # Standardize column names
+    with stage('load.columns', len(df)):
+        df = df.rename(columns={col: _standard_column_name(col) for col in df.columns})
+    
+        # Ensure required columns exist
+        required_columns = ['State', 'Date', 'TotalSamples', 'Negative', 'Positive']
+        for col in required_columns:
+            if col not in df.columns:
+                # Try to find similar columns
+                possible_matches = [c for c in df.columns if col.lower() in c.lower()]
+                if possible_matches:
+                    df = df.rename(columns={possible_matches[0]: col})
+                else:
+                    # Create placeholder column if missing
+                    df[col] = np.nan
+    
+    # Convert date column with error handling
+    with stage('load.dates', len(df)):
+        if 'Date' in df.columns:
+            if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+            # Drop rows with invalid dates
+            df = df.dropna(subset=['Date'])
+            # Keep dates as day-resolution datetime64 rather than Python date objects
+            df['Date'] = df['Date'].dt.normalize()
+    
+    # Clean State names
+    with stage('load.states', len(df)):
+        if 'State' in df.columns:
+            df['State'] = df['State'].astype(str).str.strip().str.title()
+            # Remove invalid state names
+            invalid_states = ['Nan', 'Na', 'None', 'Null', '', ' ', 'Unknown', 'Unspecified']
+            df = df[~df['State'].isin(invalid_states)]
+            # Few distinct states over many rows: store them as a categorical
+            df['State'] = df['State'].astype('category')
+    
+    # Process numeric columns
+    quality = np.zeros(len(df), dtype=np.uint8)
+    with stage('load.numeric', len(df)):
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                if not (typed and pd.api.types.is_numeric_dtype(df[col])):
+                    # Convert to string first to handle various formats
+                    df[col] = df[col].astype(str)
+                    # Remove commas, spaces, and other non-numeric characters
+                    df[col] = df[col].str.replace(',', '').str.replace(' ', '')
+                    # Convert to numeric, forcing errors to NaN
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                # Flag what the fill and clip below hide
+                quality[df[col].isna().to_numpy()] |= MISSING_FLAGS[col]
+                quality[(df[col] < 0).to_numpy()] |= QUALITY_FLAGS['clipped'][0]
+                # Replace negative values with 0
+                df[col] = df[col].clip(lower=0)
+                # Fill NaN with 0 for counts
+                df[col] = df[col].fillna(0).astype(_count_dtype(df[col]))
+    
+    # Calculate PositiveRatio safely
+    with stage('load.ratio', len(df)):
+        if all(col in df.columns for col in ['Positive', 'TotalSamples']):
+            df['PositiveRatio'] = np.where(
+                (df['TotalSamples'] > 0) & (df['Positive'].notna()),
+                df['Positive'] / df['TotalSamples'],
+                0
+            ).round(RATIO_DECIMALS).astype(np.float32)
+    
+    # Flag reports whose counts do not add up; decreases are flagged after sorting
+    with stage('load.quality', len(df)):
+        counts_known = (quality & sum(MISSING_FLAGS.values())) == 0
+        mismatch = counts_known & (
+            df['Positive'].to_numpy(np.int64) + df['Negative'].to_numpy(np.int64)
+            != df['TotalSamples'].to_numpy(np.int64)
+        )
+        quality[mismatch] |= QUALITY_FLAGS['count_mismatch'][0]
+        df['Quality'] = quality
+    
+    # Drop duplicate reports and sort
+    with stage('load.dedupe_sort') as timing:
+        df = _dedupe_and_sort(df)
+        timing['rows'] = len(df)
+    return df
+
+
+def _sequence_flags(df: pd.DataFrame, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Quality column with the decrease flags recomputed over each state's sorted reports
+
+    With `rows`, only the reports at those positions are recomputed, each
+    against the row before it.
+    """
+    quality = df['Quality'].to_numpy().copy()
+    cleared = ~np.uint8(sum(SEQUENCE_FLAGS.values()))
+    if rows is None:
+        quality &= cleared
+        rows = np.arange(1, len(df))
+    else:
+        quality[rows] &= cleared
+        rows = rows[rows > 0]
+    previous = rows - 1
+    codes = df['State'].cat.codes.to_numpy()
+    same_state = codes[rows] == codes[previous]
+    for col, flag in SEQUENCE_FLAGS.items():
+        values = df[col].to_numpy()
+        # A filled-in 0 is already flagged as missing, not as a decrease
+        known = (quality & MISSING_FLAGS[col]) == 0
+        fell = same_state & known[rows] & known[previous] & (values[rows] < values[previous])
+        quality[rows[fell]] |= flag
+    return quality
+
+
+def _dedupe_and_sort(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep the last report per (State, Date) and restore the sorted layout"""
+    if 'State' in df.columns and not isinstance(df['State'].dtype, pd.CategoricalDtype):
+        # Concatenated batches carry different categories; rebuild them
+        df['State'] = df['State'].astype('category')
+    
+    # Remove duplicates (same state and date)
+    df = df.drop_duplicates(subset=['State', 'Date'], keep='last')
+    
+    # Sort by date and state
+    df = df.sort_values(['State', 'Date'])
+    
+    # Reset index
+    df = df.reset_index(drop=True)
+    
+    # Neighbouring reports change with every merge, so decreases are flagged here
+    if 'Quality' in df.columns:
+        df['Quality'] = _sequence_flags(df)
+    
+    return df
+
+
+def _csv_engine() -> str:
+    """Prefer the multi-threaded pyarrow CSV reader when it is installed"""
+    return 'pyarrow' if pa is not None else 'c'
+
+
+def _typed_dtypes(header: pd.Index) -> Dict[str, str]:
+    """Explicit read_csv dtypes keyed by the raw CSV header names"""
+    dtypes = {}
+    for col in header:
+        name = _standard_column_name(col)
+        if name in NUMERIC_COLUMNS:
+            dtypes[col] = 'float64'
+        elif name == 'State':
+            dtypes[col] = 'str'
+    return dtypes
+
+
+def _rewind(source: Any) -> Any:
+    """Reset file-like sources so they can be parsed more than once"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def _parse_source(path: Any, typed: bool = True) -> pd.DataFrame:
+    """Parse the raw CSV (a path or binary buffer) without cleaning it
+
+    The typed path hands explicit dtypes to the parser so clean files never go
+    through the string round-trip. Files with thousands separators or stray
+    text in a count column fail the typed read and are re-read untyped; only
+    the offending columns are then scrubbed as text.
+    """
+    # Read CSV with explicit NA values handling
+    read_kwargs = dict(
+        na_values=NA_VALUES,
+        keep_default_na=True,
+        encoding='utf-8'
+    )
+    if not typed:
+        with stage('load.read') as timing:
+            df = pd.read_csv(path, **read_kwargs)
+            timing['rows'] = len(df)
+        return df
+
+    with stage('load.read') as timing:
+        header = pd.read_csv(_rewind(path), nrows=0, encoding='utf-8').columns
+        date_cols = [col for col in header if _standard_column_name(col) == 'Date']
+        read_kwargs.update(engine=_csv_engine(), parse_dates=date_cols)
+        try:
+            df = pd.read_csv(_rewind(path), dtype=_typed_dtypes(header), **read_kwargs)
+        except (ValueError, TypeError):
+            df = pd.read_csv(_rewind(path), **read_kwargs)
+        timing['rows'] = len(df)
+    return df
+
+
+def _read_source(path: Any, typed: bool = True) -> pd.DataFrame:
+    """Parse the raw CSV (a path or binary buffer) and clean it"""
+    return _clean_raw_frame(_parse_source(path, typed), typed)
+
+
+def _cache_path(path: str) -> str:
+    """Location of the columnar cache that sits next to the source CSV or snapshot directory"""
+    return f"{source_stem(path)}.cache.arrow"
+
+
+def _update_digest(digest: Any, handle: BinaryIO, size: int) -> Any:
+    """`digest` updated with the next `size` bytes of `handle`, read in 1 MiB chunks"""
+    while size > 0:
+        chunk = handle.read(min(1 << 20, size))
+        if not chunk:
+            break
+        digest.update(chunk)
+        size -= len(chunk)
+    return digest
+
+
+def _file_digest(handle: BinaryIO, size: int) -> str:
+    """SHA-256 of the first `size` bytes of a binary file"""
+    handle.seek(0)
+    return _update_digest(hashlib.sha256(), handle, size).hexdigest()
+
+
+# Blocks sampled across the ingested prefix to spot rewrites of earlier rows
+ANCHOR_SAMPLES = 16
+ANCHOR_BLOCK = 4096
+
+
+def _line_anchors(handle: BinaryIO, size: int) -> Dict[str, Any]:
+    """Fingerprint of the first `size` bytes that is cheap to re-check after an append
+
+    Hashes the header line, the last line and a fixed sample of blocks spread
+    across the prefix. An append leaves all three intact, while most rewrites
+    of earlier rows change at least one of them. A same-length edit that falls
+    between the sampled blocks and arrives together with an append is not
+    caught until the next full reload.
+    """
+    sample = hashlib.sha256()
+    handle.seek(0)
+    header = handle.readline()
+    for i in range(ANCHOR_SAMPLES):
+        handle.seek(i * size // ANCHOR_SAMPLES)
+        sample.update(handle.read(min(ANCHOR_BLOCK, size - handle.tell())))
+    window = min(size, 1 << 16)
+    handle.seek(size - window)
+    block = handle.read(window)
+    # Start of the last line, ignoring the newline that terminates it
+    anchor_start = size - window + block.rfind(b'\n', 0, max(len(block) - 1, 0)) + 1
+    return {
+        'header_sha256': hashlib.sha256(header).hexdigest(),
+        'sample_sha256': sample.hexdigest(),
+        'anchor_start': anchor_start,
+        'anchor_sha256': hashlib.sha256(block[anchor_start - (size - window):]).hexdigest()
+    }
+
+
+def _source_fingerprint(handle: BinaryIO, stat: os.stat_result, digest: Optional[str] = None,
+                        hash_content: bool = True) -> Dict[str, Any]:
+    """Identify a source by size, mtime, content hash and pipeline version
+
+    Only the first `stat.st_size` bytes of `handle` are hashed. `stat` must be
+    taken before the source is read, and only that many bytes parsed: rows
+    appended meanwhile then show up as an append on the next load.
+    """
+    if digest is None and hash_content:
+        digest = _file_digest(handle, stat.st_size)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'pipeline_version': PIPELINE_VERSION,
+        **_line_anchors(handle, stat.st_size)
+    }
+
+
+def _read_cache(path: str) -> Tuple[Optional[pd.DataFrame], Optional[Dict[str, Any]]]:
+    """Memory-map the cached frame for `path`, returning (frame, stored key)"""
+    cache_file = _cache_path(path)
+    if pa is None or not os.path.exists(cache_file):
+        return None, None
+    try:
+        with pa.memory_map(cache_file, 'r') as source:
+            reader = pa_ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            stored = json.loads(metadata.get(CACHE_KEY_FIELD, b'{}'))
+            if stored.get('pipeline_version') != PIPELINE_VERSION:
+                return None, None
+            return reader.read_all().to_pandas(), stored
+    except (OSError, ValueError, pa.ArrowException):
+        # A corrupt or half-written cache is never fatal, just rebuild it
+        return None, None
+
+
+def _write_arrow(df: pd.DataFrame, target: str, key: Dict[str, Any]) -> None:
+    """Atomically write `df` as an uncompressed Arrow IPC file tagged with `key`"""
+    tmp_file = f"{target}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            CACHE_KEY_FIELD: json.dumps(key).encode('utf-8')
+        })
+        with pa.OSFile(tmp_file, 'wb') as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_file, target)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _write_cache(df: pd.DataFrame, path: str, key: Dict[str, Any]) -> None:
+    """Atomically write the cleaned frame as an Arrow IPC file next to the CSV"""
+    if pa is None:
+        return
+    try:
+        _write_arrow(df, _cache_path(path), key)
+    except (OSError, pa.ArrowException):
+        # Read-only deploys simply run without the on-disk cache
+        pass
+
+
+def write_dataset(df: pd.DataFrame, target: str, source: str) -> None:
+    """Publish the cleaned frame of `source` as an Arrow file for map_dataset"""
+    if pa is None:
+        raise ImportError("Shared Arrow datasets require pyarrow")
+    _write_arrow(df, target, {
+        'pipeline_version': PIPELINE_VERSION,
+        'source': os.path.abspath(source),
+        'rows': len(df)
+    })
+
+
+def map_dataset(target: str) -> pd.DataFrame:
+    """Memory-map a dataset written by write_dataset, read-only and without parsing
+
+    Columns are zero-copy views of the mapped file, so every process mapping
+    the same file shares a single copy in the OS page cache. Replacing the
+    file (write_dataset renames over it) leaves existing mappings intact.
+    """
+    if pa is None:
+        raise ImportError("Shared Arrow datasets require pyarrow")
+    # The mapping stays open for as long as the returned columns reference it
+    reader = pa_ipc.open_file(pa.memory_map(target, 'r'))
+    stored = json.loads((reader.schema.metadata or {}).get(CACHE_KEY_FIELD, b'{}'))
+    if stored.get('pipeline_version') != PIPELINE_VERSION:
+        raise ValueError(
+            f"{target} was written by pipeline version {stored.get('pipeline_version')}, "
+            f"expected {PIPELINE_VERSION}; re-run ingest.py"
+        )
+    return reader.read_all().to_pandas(split_blocks=True)
+
+
+def _append_rows(cached: pd.DataFrame, appended: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """`cached` with `appended` inserted at the end of each state's run, or None
+
+    An append normally only extends each state's series with later dates, so
+    its rows go in at the end of each state's run and only their decrease flags
+    are recomputed. Tails that revise existing dates, add a state or change a
+    column's dtype return None and go through the general dedupe and sort.
+    """
+    if list(appended.columns) != list(cached.columns) or any(
+            appended[col].dtype != cached[col].dtype for col in cached.columns if col != 'State'):
+        return None
+    categories = cached['State'].cat.categories
+    codes = pd.Categorical(appended['State'], categories=categories).codes
+    if (codes < 0).any() or (np.diff(codes) < 0).any():
+        return None
+    # The cache is always written (State, Date)-sorted, so each state's run
+    # is found by binary search, as StateIndex does, without re-checking it
+    cached_codes = cached['State'].cat.codes.to_numpy()
+    starts = np.searchsorted(cached_codes, codes, side='left')
+    ends = np.searchsorted(cached_codes, codes, side='right')
+    if (starts == ends).any():
+        return None
+    if (appended['Date'].to_numpy() <= cached['Date'].to_numpy()[ends - 1]).any():
+        return None
+
+    columns = {}
+    for col in cached.columns:
+        if col == 'State':
+            columns[col] = pd.Categorical.from_codes(np.insert(cached_codes, ends, codes), categories)
+        else:
+            columns[col] = np.insert(cached[col].to_numpy(), ends, appended[col].to_numpy())
+    merged = pd.DataFrame(columns)
+    if 'Quality' in merged.columns:
+        # Inserted rows land after every row before them, hence the offsets
+        merged['Quality'] = _sequence_flags(merged, ends + np.arange(len(ends)))
+    return merged
+
+
+def _ingest_appended(path: str, cached: pd.DataFrame,
+                     stored: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """Merge rows appended since the cache was written, or None to force a full reload"""
+    offset = stored.get('size', 0)
+    stat = os.stat(path)
+    if 'anchor_start' not in stored or stat.st_size <= offset:
+        return None
+    with open(path, 'rb') as handle:
+        anchors = _line_anchors(handle, offset)
+        if any(anchors[key] != stored.get(key) for key in anchors):
+            # Earlier content was rewritten, not appended to
+            return None
+        handle.seek(0)
+        header = handle.readline()
+        handle.seek(stored['anchor_start'])
+        anchor = handle.read(offset - stored['anchor_start'])
+        # Only the bytes present at the stat; later appends are left for the next load
+        tail = handle.read(stat.st_size - offset)
+        if not anchor.endswith(b'\n'):
+            # The last ingested row had no newline; the append must start a new line
+            if not tail.startswith((b'\n', b'\r\n')):
+                return None
+        # Hashing the whole prefix would make every refresh cost as much as
+        # reading the file; appends are trusted on the anchors instead
+        key = _source_fingerprint(handle, stat, hash_content=False)
+
+    merged = cached
+    if tail.strip():
+        appended = _read_source(io.BytesIO(header + tail.lstrip(b'\r\n')))
+        merged = _append_rows(cached, appended)
+        if merged is None:
+            merged = _dedupe_and_sort(pd.concat([cached, appended], ignore_index=True))
+    _write_cache(merged, path, key)
+    return merged
+
+
+def load_frame(path: str = DATA_FILE) -> pd.DataFrame:
+    """Return the cleaned frame, served from the columnar cache when it is fresh
+
+    Rows appended to the CSV since the cache was written are parsed on their
+    own and merged in with the usual last-report-wins dedupe; any other change
+    to the file triggers a full reload. A directory or glob of daily snapshot
+    CSVs is loaded by load_snapshots instead.
+    """
+    if is_snapshot_source(path):
+        return load_snapshots(path)
+    with stage('load.cache_read') as timing:
+        cached, stored = _read_cache(path)
+        timing['rows'] = None if cached is None else len(cached)
+    if cached is not None:
+        stat = os.stat(path)
+        if (stored.get('size'), stored.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+            if not os.path.exists(manifest_path(path)):
+                _write_manifest(cached, path)
+            return cached
+        if stored.get('size') == stat.st_size and stored.get('sha256'):
+            # Same size but new mtime (fresh checkout, re-copied file): compare contents
+            with open(path, 'rb') as handle:
+                digest = _file_digest(handle, stat.st_size)
+                key = _source_fingerprint(handle, stat, digest) if digest == stored['sha256'] else None
+            if key is not None:
+                _write_cache(cached, path, key)
+                _write_manifest(cached, path)
+                return cached
+        with stage('load.append') as timing:
+            merged = _ingest_appended(path, cached, stored)
+            timing['rows'] = None if merged is None else len(merged)
+        if merged is not None:
+            _write_manifest(merged, path)
+            return merged
+
+    # Parse and fingerprint the same bytes: rows appended while reading are
+    # left for the next load to pick up as an append
+    stat = os.stat(path)
+    with open(path, 'rb') as handle:
+        source = io.BytesIO(handle.read(stat.st_size))
+    df = _read_source(source)
+    with stage('load.cache_write', len(df)):
+        _write_cache(df, path, _source_fingerprint(source, stat))
+        _write_manifest(df, path)
+    return df
+
+
+# Files of a snapshot directory; a glob source picks its own
+SNAPSHOT_PATTERN = '*.csv'
+
+
+def is_snapshot_source(path: str) -> bool:
+    """Whether `path` names a set of snapshot CSVs rather than a single file"""
+    return is_glob(path) or os.path.isdir(path)
+
+
+def snapshot_files(path: str) -> List[str]:
+    """Snapshot CSVs of a directory or glob, in path order (oldest revision first)"""
+    pattern = os.path.join(path, SNAPSHOT_PATTERN) if os.path.isdir(path) else path
+    files = sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+    if not files:
+        raise FileNotFoundError(errno.ENOENT, "No snapshot CSV files found", path)
+    return files
+
+
+def _snapshot_fingerprint(path: str, files: List[str]) -> Dict[str, Any]:
+    """Identify a snapshot set by the size and mtime of every file, in load order"""
+    root = os.path.dirname(os.path.abspath(_cache_path(path)))
+    stats = [os.stat(f) for f in files]
+    return {
+        'source': path,
+        'files': [[os.path.relpath(os.path.abspath(f), root), stat.st_size, stat.st_mtime_ns]
+                  for f, stat in zip(files, stats)],
+        'pipeline_version': PIPELINE_VERSION
+    }
+
+
+def _merge_snapshots(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate cleaned frames in load order; later revisions of a (State, Date) win"""
+    df = _dedupe_and_sort(pd.concat(frames, ignore_index=True))
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            # Files parsed on their own may disagree on the count width
+            df[col] = df[col].astype(_count_dtype(df[col]))
+    return df
+
+
+def _read_snapshot_batch(files: List[str]) -> pd.DataFrame:
+    """Parse consecutive snapshot files and clean them in a single pass"""
+    frames = []
+    for f in files:
+        df = _parse_source(f)
+        # Headers may be spelled differently from file to file
+        frames.append(df.rename(columns={col: _standard_column_name(col) for col in df.columns}))
+    return _clean_raw_frame(pd.concat(frames, ignore_index=True))
+
+
+def _snapshot_batch_worker(files: List[str]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """_read_snapshot_batch in a worker process, with the stage timings it recorded"""
+    df = _read_snapshot_batch(files)
+    return df, RECORDER.drain()
+
+
+def _worker_context() -> Any:
+    """Start method for the snapshot workers
+
+    The app loads from a multi-threaded server, where a forked child can
+    inherit a lock held by another thread and deadlock. Workers come from a
+    single-threaded fork server instead (spawned where there is none), with
+    this module preloaded so each one starts without re-importing pandas.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['data_core'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _read_snapshots(files: List[str], workers: Optional[int] = None) -> List[pd.DataFrame]:
+    """Cleaned frames of consecutive batches of `files`, fanned out over `workers` processes
+
+    Daily snapshots are small, so cleaning each file on its own would be
+    dominated by per-call overhead; each batch is cleaned once instead.
+    Stage timings taken in the workers are recorded in this process.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1:
+        return [_read_snapshot_batch(files)]
+    size = -(-len(files) // (workers * 4))
+    batches = [files[i:i + size] for i in range(0, len(files), size)]
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context()) as pool:
+        for df, timings in pool.map(_snapshot_batch_worker, batches):
+            record_timings(timings)
+            frames.append(df)
+    return frames
+
+
+def load_snapshots(path: str, workers: Optional[int] = None) -> pd.DataFrame:
+    """Cleaned frame of a directory or glob of snapshot CSVs, in the load_frame schema
+
+    Files are parsed in parallel and merged in path order, so when several
+    files report the same (State, Date) the one that sorts last wins; name
+    daily snapshots and revisions so that they sort chronologically. The
+    merged frame is cached next to the snapshot directory. New files that
+    sort after every cached one are parsed on their own and merged in; any
+    other change reloads every file. Worker processes re-import the calling
+    script, so scripts need the usual ``if __name__ == '__main__'`` guard.
+    """
+    files = snapshot_files(path)
+    key = _snapshot_fingerprint(path, files)
+    with stage('load.cache_read') as timing:
+        cached, stored = _read_cache(path)
+        timing['rows'] = None if cached is None else len(cached)
+    if cached is not None and stored.get('source') == path:
+        known = stored.get('files', [])
+        if known == key['files']:
+            if not os.path.exists(manifest_path(path)):
+                _write_manifest(cached, path)
+            return cached
+        if 0 < len(known) < len(key['files']) and key['files'][:len(known)] == known:
+            with stage('load.append') as timing:
+                df = _merge_snapshots([cached] + _read_snapshots(files[len(known):], workers))
+                timing['rows'] = len(df)
+            _write_cache(df, path, key)
+            _write_manifest(df, path)
+            return df
+
+    with stage('load.snapshots') as timing:
+        df = _merge_snapshots(_read_snapshots(files, workers))
+        timing['rows'] = len(df)
+    with stage('load.cache_write', len(df)):
+        _write_cache(df, path, key)
+        _write_manifest(df, path)
+    return df
+
+
+def dataset_manifest(df: pd.DataFrame, path: str) -> Dict[str, Any]:
+    """Headline numbers of a cleaned dataset and its source file(s), for the landing page"""
+    if is_snapshot_source(path):
+        stats = [os.stat(f) for f in snapshot_files(path)]
+        name = os.path.basename(source_stem(path))
+    else:
+        stats = [os.stat(path)]
+        name = os.path.basename(path)
+    return {
+        'source': name,
+        'source_size': sum(stat.st_size for stat in stats),
+        'source_mtime': max(stat.st_mtime for stat in stats),
+        'pipeline_version': PIPELINE_VERSION,
+        'rows': len(df),
+        'states': int(df['State'].nunique()) if not df.empty else 0,
+        'date_start': f"{df['Date'].min():%Y-%m-%d}" if not df.empty else None,
+        'date_end': f"{df['Date'].max():%Y-%m-%d}" if not df.empty else None
+    }
+
+
+def _write_manifest(df: pd.DataFrame, path: str) -> None:
+    """Refresh the metadata manifest next to the CSV after an ingest"""
+    write_manifest(path, dataset_manifest(df, path))
+
+
+def dataset_key(df: pd.DataFrame) -> Tuple[Any, ...]:
+    """Cheap identity of a cleaned dataset: row count and date bounds"""
+    if df.empty:
+        return (0, None, None)
+    return (len(df), df['Date'].min(), df['Date'].max())
+
+
+class StateIndex:
+    """Per-state row offsets into a frame sorted by (State, Date)
+
+    Each state owns one contiguous run of rows with ascending dates, so a
+    state lookup is a dictionary hit and a date range is two binary searches
+    inside that run. Queries return zero-copy positional slices.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if isinstance(df['State'].dtype, pd.CategoricalDtype):
+            codes = df['State'].cat.codes.to_numpy()
+            names = list(df['State'].cat.categories)
+        else:
+            codes, names = pd.factorize(df['State'], sort=True)
+            names = list(names)
+        self.dates = df['Date'].to_numpy()
+        self.n_rows = len(df)
+
+        # Only a (State, Date)-sorted frame can be answered by binary search
+        state_step = np.diff(codes)
+        self.is_sorted = bool(
+            np.all(state_step >= 0) and
+            np.all((state_step > 0) | (np.diff(self.dates) >= np.timedelta64(0)))
+        )
+        bounds = np.searchsorted(codes, np.arange(len(names) + 1)) if self.is_sorted else []
+        self.offsets = {
+            name: (int(bounds[i]), int(bounds[i + 1]))
+            for i, name in enumerate(names)
+            if self.is_sorted and bounds[i] < bounds[i + 1]
+        }
+
+    def states(self) -> List[str]:
+        """States present in the indexed frame, in sorted order"""
+        return list(self.offsets)
+
+    def locate(self, state: str, start: Optional[pd.Timestamp] = None,
+               end: Optional[pd.Timestamp] = None) -> Tuple[int, int]:
+        """Positional [start, stop) bounds of `state` rows within the date range"""
+        lo, hi = self.offsets.get(state, (0, 0))
+        if start is not None:
+            lo = lo + int(np.searchsorted(self.dates[lo:hi], start.to_datetime64(), side='left'))
+        if end is not None:
+            hi = lo + int(np.searchsorted(self.dates[lo:hi], end.to_datetime64(), side='right'))
+        return lo, hi
+
+
+def filter_data(
+    df: pd.DataFrame,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    positive_range: Tuple[int, int] = None,
+    index: Optional[StateIndex] = None
+) -> pd.DataFrame:
+    """Filter data by states, date range, and positive cases range
+
+    Rows come back sorted by State ascending and Date descending. Pass a
+    prebuilt StateIndex for `df` to avoid rebuilding it on every call.
+    """
+    if df.empty:
+        return pd.DataFrame()
+    
+    if index is None or index.n_rows != len(df):
+        index = StateIndex(df)
+    
+    start_date = end_date = None
+    if date_range and len(date_range) == 2:
+        start_date, end_date = (pd.Timestamp(d) for d in date_range)
+    
+    if index.is_sorted:
+        # Filter by states and date range with binary searches per state
+        wanted = set(states) if states and len(states) > 0 else None
+        slices = []
+        for state in index.states():
+            if wanted is not None and state not in wanted:
+                continue
+            lo, hi = index.locate(state, start_date, end_date)
+            if lo < hi:
+                slices.append(df.iloc[lo:hi].iloc[::-1])
+        if not slices:
+            filtered_df = df.iloc[0:0]
+        elif len(slices) == 1:
+            filtered_df = slices[0]
+        else:
+            filtered_df = pd.concat(slices)
+    else:
+        filtered_df = df
+        
+        # Filter by states
+        if states and len(states) > 0:
+            filtered_df = filtered_df[filtered_df['State'].isin(states)]
+        
+        # Filter by date range
+        if start_date is not None:
+            filtered_df = filtered_df[
+                (filtered_df['Date'] >= start_date) & 
+                (filtered_df['Date'] <= end_date)
+            ]
+        filtered_df = filtered_df.sort_values(['State', 'Date'], ascending=[True, False])
+    
+    # Filter by positive range
+    if positive_range and 'Positive' in filtered_df.columns:
+        min_positive, max_positive = positive_range
+        filtered_df = filtered_df[
+            (filtered_df['Positive'] >= min_positive) &
+            (filtered_df['Positive'] <= max_positive)
+        ]
+    
+    return filtered_df
+
+
+ROLLUP_COLUMNS = ['TotalSamples', 'Positive', 'Negative', 'PositiveRatio']
+
+# Coarsest first: whole months are taken from the cube before whole weeks
+ROLLUP_FREQS = ['M', 'W']
+
+AGGREGATE_COLUMNS = ['State', 'Total', 'Average', 'Peak', 'Latest']
+
+ONE_DAY = pd.Timedelta(days=1)
+
+
+class RollupCube:
+    """State x period aggregates (sum, count, max, last) built once per dataset
+
+    Every level is a set of flat arrays sorted by (state code, period), so a
+    query is a handful of vectorised masks over a few thousand cells rather
+    than a group-by over every row.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        states = df['State'].astype('category')
+        self.states = list(states.cat.categories)
+        self.columns = [col for col in ROLLUP_COLUMNS if col in df.columns]
+        self.n_rows = len(df)
+        self.date_bounds = (df['Date'].min(), df['Date'].max())
+        codes = states.cat.codes.to_numpy()
+        self.levels = {}
+        for freq in ROLLUP_FREQS:
+            grouped = df.groupby([codes, df['Date'].dt.to_period(freq)], sort=True)
+            stats = grouped[self.columns].agg(['sum', 'count', 'max', 'last'])
+            periods = stats.index.get_level_values(1)
+            level = {
+                'state': stats.index.get_level_values(0).to_numpy(),
+                'start': periods.start_time.to_numpy(),
+                'end': periods.end_time.normalize().to_numpy(),
+                'count': stats[(self.columns[0], 'count')].to_numpy(),
+                'last_date': grouped['Date'].max().to_numpy()
+            }
+            for col in self.columns:
+                level[col] = {agg: stats[(col, agg)].to_numpy() for agg in ('sum', 'max', 'last')}
+            self.levels[freq] = level
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """Whether the cube was built from (a copy of) `df`"""
+        return dataset_key(df) == (self.n_rows, *self.date_bounds)
+
+    def state_mask(self, states: Optional[List[str]]) -> np.ndarray:
+        """Boolean mask over state codes selecting `states` (all when empty)"""
+        if not states:
+            return np.ones(len(self.states), dtype=bool)
+        return np.isin(np.array(self.states, dtype=object), list(states))
+
+    def cells(self, freq: str, start: pd.Timestamp, end: pd.Timestamp,
+              wanted: np.ndarray) -> np.ndarray:
+        """Mask of `freq` cells for wanted states lying inside [start, end]"""
+        level = self.levels[freq]
+        return ((level['start'] >= start.to_datetime64()) &
+                (level['end'] <= end.to_datetime64()) &
+                wanted[level['state']])
+
+
+def _whole_periods(start: pd.Timestamp, end: pd.Timestamp,
+                   freq: str) -> Optional[Tuple[pd.Period, pd.Period]]:
+    """First and last period of `freq` lying entirely inside [start, end]"""
+    first, last = pd.Period(start, freq), pd.Period(end, freq)
+    if first.start_time < start:
+        first += 1
+    if last.end_time.normalize() > end:
+        last -= 1
+    return (first, last) if first <= last else None
+
+
+def _split_range(start: pd.Timestamp, end: pd.Timestamp, freqs: List[str]
+                 ) -> Tuple[List[Tuple[str, pd.Timestamp, pd.Timestamp]], List[Tuple[pd.Timestamp, pd.Timestamp]]]:
+    """Split [start, end] into whole cube periods and leftover raw day ranges"""
+    if start > end:
+        return [], []
+    if not freqs:
+        return [], [(start, end)]
+    span = _whole_periods(start, end, freqs[0])
+    if span is None:
+        return _split_range(start, end, freqs[1:])
+    first, last = span
+    first_day, last_day = first.start_time, last.end_time.normalize()
+    head_periods, head_raw = _split_range(start, first_day - ONE_DAY, freqs[1:])
+    tail_periods, tail_raw = _split_range(last_day + ONE_DAY, end, freqs[1:])
+    return head_periods + [(freqs[0], first_day, last_day)] + tail_periods, head_raw + tail_raw
+
+
+def _aggregate_rows(rows: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """Total, Average, Peak and Latest of `metric` per state over raw rows"""
+    ordered = rows.sort_values(['State', 'Date'])
+    agg_df = ordered.groupby('State', observed=True).agg(
+        Total=pd.NamedAgg(column=metric, aggfunc='sum'),
+        Average=pd.NamedAgg(column=metric, aggfunc='mean'),
+        Peak=pd.NamedAgg(column=metric, aggfunc='max'),
+        Latest=pd.NamedAgg(column=metric, aggfunc='last')
+    ).reset_index()
+    agg_df['State'] = agg_df['State'].astype(str)
+    return agg_df
+
+
+def aggregate_by_state(
+    df: pd.DataFrame,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    metric: str = 'TotalSamples',
+    cube: Optional[RollupCube] = None,
+    index: Optional[StateIndex] = None
+) -> pd.DataFrame:
+    """Total, Average, Peak and Latest of `metric` per state over a date range
+
+    Whole months and weeks are answered from `cube`; only the edge days are
+    read from raw rows. Without a usable cube (or for a metric it does not
+    carry) the filtered rows are grouped directly.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+    if index is None or index.n_rows != len(df):
+        index = StateIndex(df)
+    if (cube is None or metric not in cube.columns or not index.is_sorted
+            or not cube.matches(df)):
+        return _aggregate_rows(filter_data(df, states, date_range, index=index), metric)
+
+    if date_range and len(date_range) == 2:
+        start, end = (pd.Timestamp(d) for d in date_range)
+    else:
+        start, end = cube.date_bounds
+    periods, raw_ranges = _split_range(start, end, ROLLUP_FREQS)
+    wanted = cube.state_mask(states)
+
+    # Whole periods straight from the cube
+    parts = {key: [] for key in ('state', 'sum', 'count', 'max', 'last', 'last_date')}
+    for freq, first_day, last_day in periods:
+        level = cube.levels[freq]
+        cells = cube.cells(freq, first_day, last_day, wanted)
+        for key in ('state', 'count', 'last_date'):
+            parts[key].append(level[key][cells])
+        for key in ('sum', 'max', 'last'):
+            parts[key].append(level[metric][key][cells])
+
+    # Partial edge periods from the raw rows of each wanted state
+    values, dates = df[metric].to_numpy(), index.dates
+    for raw_start, raw_end in raw_ranges:
+        for code in np.flatnonzero(wanted):
+            lo, hi = index.locate(cube.states[code], raw_start, raw_end)
+            if lo < hi:
+                window = values[lo:hi]
+                parts['state'].append([code])
+                parts['sum'].append([window.sum(dtype=np.float64)])
+                parts['count'].append([hi - lo])
+                parts['max'].append([window.max()])
+                parts['last'].append([window[-1]])
+                parts['last_date'].append([dates[hi - 1]])
+
+    codes = np.concatenate(parts['state']).astype(np.int64) if parts['state'] else np.array([], dtype=np.int64)
+    if not len(codes):
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+    size = len(cube.states)
+    total = np.bincount(codes, weights=np.concatenate(parts['sum']).astype(np.float64), minlength=size)
+    count = np.bincount(codes, weights=np.concatenate(parts['count']), minlength=size)
+    peak = np.full(size, -np.inf)
+    np.maximum.at(peak, codes, np.concatenate(parts['max']).astype(np.float64))
+
+    # Latest value: the piece with the most recent date per state
+    order = np.lexsort((np.concatenate(parts['last_date']), codes))
+    ordered_codes = codes[order]
+    is_last = np.r_[ordered_codes[1:] != ordered_codes[:-1], True]
+    latest = np.zeros(size)
+    latest[ordered_codes[is_last]] = np.concatenate(parts['last']).astype(np.float64)[order][is_last]
+
+    present = count > 0
+    agg_df = pd.DataFrame({
+        'State': np.array(cube.states, dtype=object)[present],
+        'Total': total[present],
+        'Average': total[present] / count[present],
+        'Peak': peak[present],
+        'Latest': latest[present]
+    })
+    if pd.api.types.is_integer_dtype(df[metric]):
+        agg_df = agg_df.astype({'Total': np.int64, 'Peak': np.int64, 'Latest': np.int64})
+    return agg_df
+
+
+def aggregate_by_month(
+    df: pd.DataFrame,
+    state: str,
+    date_range: Tuple[date, date] = None,
+    cube: Optional[RollupCube] = None,
+    index: Optional[StateIndex] = None
+) -> pd.DataFrame:
+    """Monthly TotalSamples/Positive/Negative sums and PositiveRatio for one state"""
+    columns = ['TotalSamples', 'Positive', 'Negative']
+    if date_range and len(date_range) == 2:
+        start, end = (pd.Timestamp(d) for d in date_range)
+    else:
+        start, end = df['Date'].min(), df['Date'].max()
+
+    parts = []
+    raw_ranges = [(start, end)]
+    span = _whole_periods(start, end, 'M')
+    if (cube is not None and span is not None and cube.matches(df)
+            and all(col in cube.columns for col in columns)):
+        first, last = span
+        first_day, last_day = first.start_time, last.end_time.normalize()
+        level = cube.levels['M']
+        cells = cube.cells('M', first_day, last_day, cube.state_mask([state]))
+        parts.append(pd.DataFrame(
+            {col: level[col]['sum'][cells] for col in columns},
+            index=pd.PeriodIndex(level['start'][cells], freq='M', name='Month')
+        ))
+        raw_ranges = [(start, first_day - ONE_DAY), (last_day + ONE_DAY, end)]
+
+    for raw_start, raw_end in raw_ranges:
+        if raw_start > raw_end:
+            continue
+        rows = filter_data(df, [state], (raw_start, raw_end), index=index)
+        if not rows.empty:
+            parts.append(rows.groupby(rows['Date'].dt.to_period('M').rename('Month'))[columns].sum())
+
+    if not parts:
+        return pd.DataFrame(columns=['Month'] + columns + ['PositiveRatio'])
+    monthly_stats = pd.concat(parts).groupby(level='Month').sum().reset_index()
+    monthly_stats['Month'] = monthly_stats['Month'].astype(str)
+    monthly_stats['PositiveRatio'] = monthly_stats['Positive'] / monthly_stats['TotalSamples']
+    return monthly_stats
+
+
+# Census 2011 population, keyed by the cleaned (title-cased) state names
+STATE_POPULATION = {
+    'Andaman And Nicobar Islands': 380581,
+    'Andhra Pradesh': 49577103,
+    'Arunachal Pradesh': 1383727,
+    'Assam': 31205576,
+    'Bihar': 104099452,
+    'Chandigarh': 1055450,
+    'Chhattisgarh': 25545198,
+    'Dadra And Nagar Haveli And Daman And Diu': 586956,
+    'Delhi': 16787941,
+    'Goa': 1458545,
+    'Gujarat': 60439692,
+    'Haryana': 25351462,
+    'Himachal Pradesh': 6864602,
+    'Jammu And Kashmir': 12267013,
+    'Jharkhand': 32988134,
+    'Karnataka': 61095297,
+    'Kerala': 33406061,
+    'Ladakh': 274289,
+    'Lakshadweep': 64473,
+    'Madhya Pradesh': 72626809,
+    'Maharashtra': 112374333,
+    'Manipur': 2855794,
+    'Meghalaya': 2966889,
+    'Mizoram': 1097206,
+    'Nagaland': 1978502,
+    'Odisha': 41974218,
+    'Puducherry': 1247953,
+    'Punjab': 27743338,
+    'Rajasthan': 68548437,
+    'Sikkim': 610577,
+    'Tamil Nadu': 72147030,
+    'Telangana': 35003674,
+    'Tripura': 3673917,
+    'Uttar Pradesh': 199812341,
+    'Uttarakhand': 10086292,
+    'West Bengal': 91276115
+}
+
+# name -> {'label': display label, 'compute': func(df, index, store) -> ndarray}
+DERIVED_METRICS: Dict[str, Dict[str, Any]] = {}
+
+
+def derived_metric(name: str, label: str):
+    """Register a derived metric that is computed on first use"""
+    def register(func):
+        DERIVED_METRICS[name] = {'label': label, 'compute': func}
+        return func
+    return register
+
+
+def _known_values(df: pd.DataFrame, col: str) -> np.ndarray:
+    """`col` as float64 with values the source left blank (zero-filled at load) as NaN"""
+    values = df[col].to_numpy(dtype=np.float64)
+    if 'Quality' in df.columns and col in MISSING_FLAGS:
+        missing = (df['Quality'].to_numpy() & MISSING_FLAGS[col]) != 0
+        values = np.where(missing, np.nan, values)
+    return values
+
+
+def _daily_increment(df: pd.DataFrame, index: StateIndex, col: str) -> np.ndarray:
+    """Per-state increase per day between consecutive known reports of a cumulative count
+
+    A report that follows a gap of several days gets the increase averaged
+    over the gap rather than a one-day spike. Rows next to a missing value,
+    and decreases (revisions of the running total), have no meaningful
+    increment and come out as NaN.
+    """
+    if not index.is_sorted:
+        ordered = df.sort_values(['State', 'Date'])
+        increments = _daily_increment(ordered, StateIndex(ordered), col)
+        return pd.Series(increments, index=ordered.index).reindex(df.index).to_numpy()
+    values = _known_values(df, col)
+    increments = np.empty_like(values)
+    increments[0:1] = np.nan
+    days = np.diff(index.dates) / np.timedelta64(1, 'D')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        increments[1:] = np.diff(values) / days
+    # The first report of each state has nothing to diff against
+    increments[[start for start, _ in index.offsets.values()]] = np.nan
+    with np.errstate(invalid='ignore'):
+        increments[increments < 0] = np.nan
+    return increments
+
+
+def _per_million(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Cumulative count per million residents of the row's state"""
+    population = df['State'].map(STATE_POPULATION).astype(np.float64).to_numpy()
+    return _known_values(df, col) / population * 1e6
+
+
+@derived_metric('DailySamples', 'Daily New Samples')
+def _daily_samples(df, index, store):
+    return _daily_increment(df, index, 'TotalSamples')
+
+
+@derived_metric('DailyPositive', 'Daily New Positives')
+def _daily_positive(df, index, store):
+    return _daily_increment(df, index, 'Positive')
+
+
+@derived_metric('DailyPositivity', 'Daily Positivity Rate')
+def _daily_positivity(df, index, store):
+    samples = store.values('DailySamples', df, index)
+    positive = store.values('DailyPositive', df, index)
+    # More new positives than new samples means the two totals were not
+    # updated together, so the day has no usable rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((samples > 0) & (positive <= samples), positive / samples, np.nan)
+
+
+@derived_metric('SamplesPerMillion', 'Samples per Million')
+def _samples_per_million(df, index, store):
+    return _per_million(df, 'TotalSamples')
+
+
+@derived_metric('PositivePerMillion', 'Positives per Million')
+def _positive_per_million(df, index, store):
+    return _per_million(df, 'Positive')
+
+
+class MetricStore:
+    """Memoised derived-metric columns for one dataset, filled on first use"""
+
+    def __init__(self):
+        self._key = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def values(self, name: str, df: pd.DataFrame,
+               index: Optional[StateIndex] = None) -> np.ndarray:
+        """Full-length values of metric `name` aligned with the rows of `df`"""
+        key = dataset_key(df)
+        with self._lock:
+            if key != self._key:
+                self._key, self._columns = key, {}
+            column = self._columns.get(name)
+        if column is None:
+            if index is None or index.n_rows != len(df):
+                index = StateIndex(df)
+            column = DERIVED_METRICS[name]['compute'](df, index, self)
+            column.flags.writeable = False
+            with self._lock:
+                if key == self._key:
+                    self._columns[name] = column
+        return column
+
+
+def with_metric(
+    rows: pd.DataFrame,
+    df: pd.DataFrame,
+    name: str,
+    index: Optional[StateIndex] = None,
+    store: Optional[MetricStore] = None
+) -> pd.DataFrame:
+    """`rows` (a filtered subset of `df`) with derived metric `name` attached"""
+    if name not in DERIVED_METRICS or name in rows.columns:
+        return rows
+    store = store if store is not None else MetricStore()
+    values = store.values(name, df, index)
+    return rows.assign(**{name: values[df.index.get_indexer(rows.index)]})
+
+
+def _freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with read-only column arrays; columns that already are are not copied"""
+    columns = {}
+    for col in df.columns:
+        categorical = isinstance(df[col].dtype, pd.CategoricalDtype)
+        values = df[col].cat.codes.to_numpy() if categorical else df[col].to_numpy()
+        if not values.flags.writeable:
+            # Already frozen, e.g. mapped from an Arrow file: share it as is
+            columns[col] = df[col].array if categorical else values
+            continue
+        values = values.copy()
+        values.flags.writeable = False
+        columns[col] = (pd.Categorical.from_codes(values, dtype=df[col].dtype)
+                        if categorical else values)
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def quality_mask(df: pd.DataFrame, flags: Optional[List[str]] = None) -> np.ndarray:
+    """Rows with any of the named quality flags set (all flags by default)"""
+    names = QUALITY_FLAGS if flags is None else flags
+    bits = sum(QUALITY_FLAGS[name][0] for name in names)
+    return (df['Quality'].to_numpy() & bits) != 0
+
+
+def filter_quality(df: pd.DataFrame, mode: str = 'all',
+                   flags: Optional[List[str]] = None) -> pd.DataFrame:
+    """Keep 'all' rows, only the 'flagged' ones or only the 'clean' ones"""
+    if mode == 'all' or 'Quality' not in df.columns:
+        return df
+    if mode not in ('flagged', 'clean'):
+        raise ValueError(f"Unknown quality filter: {mode}")
+    mask = quality_mask(df, flags)
+    return df[mask if mode == 'flagged' else ~mask]
+
+
+def quality_labels(quality: pd.Series) -> pd.Series:
+    """Readable flag names per row, labelling each distinct bitmask once"""
+    labels = {
+        value: ', '.join(label for bit, label in QUALITY_FLAGS.values() if value & bit)
+        for value in np.unique(quality.to_numpy())
+    }
+    return quality.map(labels)
+
+
+def quality_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-state row counts of every quality flag, plus flagged and total rows"""
+    columns = ['State', 'Records', 'Flagged'] + [label for _, label in QUALITY_FLAGS.values()]
+    if df.empty or 'Quality' not in df.columns:
+        return pd.DataFrame(columns=columns)
+    codes, names = pd.factorize(df['State'], sort=True)
+    quality = df['Quality'].to_numpy()
+    size = len(names)
+    summary = pd.DataFrame({
+        'State': np.asarray(names, dtype=object),
+        'Records': np.bincount(codes, minlength=size),
+        'Flagged': np.bincount(codes, weights=quality != 0, minlength=size).astype(np.int64),
+        **{label: np.bincount(codes, weights=(quality & bit) != 0, minlength=size).astype(np.int64)
+           for bit, label in QUALITY_FLAGS.values()}
+    })
+    return summary[columns]
+
+
+# Generation counter behind Dataset.version
+_DATASET_VERSIONS = itertools.count(1)
+
+
+class Dataset:
+    """Read-only cleaned dataset with its index, rollup cube and derived metrics
+
+    One instance is shared by every session. Column arrays are frozen and
+    view() hands out shallow copies: adding or replacing a column only changes
+    the caller's copy, while writing into shared values raises instead of
+    leaking into other sessions.
+
+    `version` is unique to each instance in the process, so caches keyed on it
+    miss after a reload even when a revision left the row count and date
+    bounds (`key`) unchanged.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._frame = _freeze(df)
+        self.key = dataset_key(self._frame)
+        self.version = next(_DATASET_VERSIONS)
+        self.index = StateIndex(self._frame)
+        self.metrics = MetricStore()
+        self._cube: Optional[RollupCube] = None
+        self._cube_built = False
+        self._quality: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    @property
+    def empty(self) -> bool:
+        return self._frame.empty
+
+    def view(self) -> pd.DataFrame:
+        """Shallow, copy-on-write view of the shared frame"""
+        return self._frame.copy(deep=False)
+
+    @property
+    def cube(self) -> Optional[RollupCube]:
+        """Rollup cube, built by the first caller; None if it cannot be built"""
+        with self._lock:
+            if not self._cube_built:
+                try:
+                    self._cube = RollupCube(self._frame) if not self._frame.empty else None
+                except Exception:
+                    # Pages fall back to grouping raw rows when no cube is available
+                    self._cube = None
+                self._cube_built = True
+            return self._cube
+
+    @property
+    def quality(self) -> pd.DataFrame:
+        """Per-state quality summary of the ingest-time flags, built by the first caller"""
+        with self._lock:
+            if self._quality is None:
+                self._quality = quality_summary(self._frame)
+            return self._quality
+
+
+class PandasEngine:
+    """Default query engine: the pandas functions above over a shared Dataset
+
+    Other engines (see duckdb_engine.py and polars_engine.py) expose the same
+    queries and return identical results, so pages can switch between them
+    freely.
+    """
+
+    name = 'pandas'
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+
+    def filter_data(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        return filter_data(self.dataset.view(), states, date_range, positive_range,
+                           self.dataset.index)
+
+    def aggregate_by_state(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        metric: str = 'TotalSamples'
+    ) -> pd.DataFrame:
+        return aggregate_by_state(self.dataset.view(), states, date_range, metric,
+                                  cube=self.dataset.cube, index=self.dataset.index)
+
+    def aggregate_by_month(
+        self,
+        state: str,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        if positive_range:
+            # The rollup cube only holds unfiltered rows
+            rows = self.filter_data([state], date_range, positive_range)
+            return aggregate_by_month(rows, state, date_range)
+        return aggregate_by_month(self.dataset.view(), state, date_range,
+                                  cube=self.dataset.cube, index=self.dataset.index)
+
+    def summary(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None
+    ) -> Dict[str, Any]:
+        if not states and not date_range:
+            return get_data_summary(self.dataset.view())
+        # Back in load order, so ties for the peak day resolve as on the full frame
+        return get_data_summary(self.filter_data(states, date_range).sort_index())
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Positions kept by Largest-Triangle-Three-Buckets downsampling
+
+    `x` must be ascending. The first and last points are always kept; every
+    bucket in between contributes the point forming the largest triangle with
+    the previously kept point and the next bucket's mean, which preserves
+    peaks and troughs far better than striding.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    finite = np.isfinite(y)
+    if not finite.all():
+        # Missing values have no shape to preserve: downsample the known points
+        known = np.flatnonzero(finite)
+        return known[lttb_indices(x[known], y[known], threshold)]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous]) -
+            (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample_series(
+    df: pd.DataFrame,
+    y: str,
+    max_points: int,
+    x: str = 'Date',
+    group: str = 'State'
+) -> pd.DataFrame:
+    """Cap every `group` series at `max_points` rows using LTTB on (x, y)"""
+    pieces = []
+    for _, series in df.sort_values([group, x]).groupby(group, observed=True, sort=False):
+        kept = lttb_indices(series[x].to_numpy().astype(np.int64), series[y].to_numpy(), max_points)
+        pieces.append(series.iloc[kept])
+    if not pieces:
+        return df.iloc[0:0]
+    return pd.concat(pieces)
+
+
+# Figures kept in the shared figure cache, and the serialised bytes they may
+# hold in total; a figure bigger than the budget is rebuilt on every view
+FIGURE_CACHE_SIZE = 128
+FIGURE_CACHE_BYTES = 128 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry when full
+
+    Besides `max_entries`, an optional `max_bytes` caps the total of the
+    sizes passed to put(); a value larger than the whole budget is not stored.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Any, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Value stored under `key`, marking it as most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Any, value: Any, nbytes: int = 0) -> None:
+        """Store `value` of size `nbytes`, evicting the oldest entries beyond capacity"""
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+
+def figure_cache_key(
+    chart: str,
+    version: Any,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    metric: str = None,
+    **options: Any
+) -> Tuple[Any, ...]:
+    """Normalised figure query: same view, same key, whatever the widget order
+
+    `version` identifies the data the figure was built from, normally
+    Dataset.version.
+    """
+    dates = None
+    if date_range and len(date_range) == 2:
+        dates = tuple(pd.Timestamp(d).strftime('%Y-%m-%d') for d in date_range)
+    return (
+        chart,
+        version,
+        tuple(sorted(set(states or []))),
+        dates,
+        metric,
+        tuple(sorted(options.items()))
+    )
+
+
+def to_export_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows as downloaded: quality flags by name, float32 widened to rounded float64"""
+    if 'Quality' in df.columns:
+        # The raw bitmask means nothing without QUALITY_FLAGS; export the labels
+        df = df.assign(Quality=quality_labels(df['Quality']).astype('string'))
+    narrow = df.select_dtypes(include=[np.float32]).columns
+    if len(narrow) == 0:
+        return df
+    return df.astype({col: np.float64 for col in narrow}).round({col: RATIO_DECIMALS for col in narrow})
+
+
+def frame_to_json(df: pd.DataFrame, pretty: bool = False, lines: bool = False) -> str:
+    """Serialise rows as JSON records straight from the columns
+
+    Dates are written as YYYY-MM-DD strings and counts/ratios as plain JSON
+    numbers, matching the old per-row encoder without building a dict per
+    row. `pretty` indents records by two spaces; `lines` writes NDJSON.
+    """
+    export = to_export_frame(df)
+    date_cols = export.select_dtypes(include=['datetime']).columns
+    if len(date_cols):
+        export = export.assign(**{col: export[col].dt.strftime('%Y-%m-%d') for col in date_cols})
+    return export.to_json(
+        orient='records',
+        lines=lines,
+        indent=2 if pretty and not lines else None,
+        double_precision=15
+    )
+
+
+STATE_STATS_COLUMNS = [
+    'State', 'Records', 'Start', 'End', 'TotalSamples', 'Positive', 'Negative',
+    'AvgSamples', 'AvgPositive', 'AvgPositiveRatio', 'MinSamples', 'MaxSamples',
+    'MaxPositive', 'PeakPositiveDate', 'PeakRatioDate'
+]
+
+
+def _run_stats(df: pd.DataFrame, starts: np.ndarray) -> Dict[str, Any]:
+    """Every statistic of each contiguous run of rows starting at `starts`, in one pass
+
+    Each column is reduced once per statistic with ufunc.reduceat; peak days
+    are the first row of a run holding its maximum, as idxmax picks them.
+    """
+    n = len(df)
+    counts = np.diff(np.r_[starts, n])
+
+    def first_peak(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        peak = np.maximum.reduceat(values, starts)
+        # Rows equal to their run's maximum are few; keep the first of each run
+        hits = np.flatnonzero(values == np.repeat(peak, counts))
+        runs = np.searchsorted(starts, hits, side='right') - 1
+        _, first = np.unique(runs, return_index=True)
+        return peak, hits[first]
+
+    dates = df['Date'].to_numpy()
+    days = dates.view(np.int64)
+    samples, positive = df['TotalSamples'].to_numpy(), df['Positive'].to_numpy()
+    ratio = df['PositiveRatio'].to_numpy()
+    max_positive, peak_positive = first_peak(positive)
+    _, peak_ratio = first_peak(ratio)
+    # Widen before reducing: int32 sums overflow and float32 sums drift
+    sums = {col: np.add.reduceat(df[col].to_numpy().astype(np.int64), starts)
+            for col in NUMERIC_COLUMNS}
+    return {
+        'Records': counts,
+        'Start': np.minimum.reduceat(days, starts).view(dates.dtype),
+        'End': np.maximum.reduceat(days, starts).view(dates.dtype),
+        **sums,
+        'AvgSamples': sums['TotalSamples'] / counts,
+        'AvgPositive': sums['Positive'] / counts,
+        'AvgPositiveRatio': np.add.reduceat(ratio.astype(np.float64), starts) / counts,
+        'MinSamples': np.minimum.reduceat(samples, starts),
+        'MaxSamples': np.maximum.reduceat(samples, starts),
+        'MaxPositive': max_positive,
+        'PeakPositiveDate': dates[peak_positive],
+        'PeakRatioDate': dates[peak_ratio]
+    }
+
+
+def state_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """One row of summary statistics per state, computed in a single grouped pass
+
+    Rows of a state are expected to be contiguous, as load_frame and
+    filter_data return them; otherwise they are grouped with a stable sort
+    first. States come back in category (sorted) order, like a groupby.
+    get_data_summary, stats_summary and the Data Explorer's Quick Statistics
+    are all read off this table.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=STATE_STATS_COLUMNS)
+    if isinstance(df['State'].dtype, pd.CategoricalDtype):
+        codes, names = df['State'].cat.codes.to_numpy(), df['State'].cat.categories
+    else:
+        codes, names = pd.factorize(df['State'], sort=True)
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    if len(boundaries) + 1 != len(np.unique(codes[np.r_[0, boundaries]])):
+        order = np.argsort(codes, kind='stable')
+        df, codes = df.iloc[order], codes[order]
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    stats = pd.DataFrame(_run_stats(df, starts))
+    stats.insert(0, 'State', np.asarray(names, dtype=object)[codes[starts]])
+    if np.any(np.diff(codes[starts]) < 0):
+        stats = stats.iloc[np.argsort(codes[starts])].reset_index(drop=True)
+    return stats
+
+
+def summarize_state_stats(stats: pd.DataFrame) -> Dict[str, Any]:
+    """The get_data_summary dictionary, derived from a state_stats table"""
+    if stats.empty:
+        return {}
+    records = stats['Records'].sum()
+    peak = stats.loc[stats['MaxPositive'].idxmax()]
+    return {
+        'total_records': int(records),
+        'total_states': len(stats),
+        'date_range': {
+            'start': stats['Start'].min().strftime('%Y-%m-%d'),
+            'end': stats['End'].max().strftime('%Y-%m-%d')
+        },
+        'total_samples': int(stats['TotalSamples'].sum()),
+        'total_positive': int(stats['Positive'].sum()),
+        'total_negative': int(stats['Negative'].sum()),
+        'avg_positive_ratio': float((stats['AvgPositiveRatio'] * stats['Records']).sum() / records),
+        'peak_positive_day': {
+            'date': peak['PeakPositiveDate'].strftime('%Y-%m-%d'),
+            'value': int(peak['MaxPositive']),
+            'state': peak['State']
+        },
+        'states_with_highest_positivity': (
+            stats.set_index('State')['AvgPositiveRatio'].nlargest(3).to_dict()
+        )
+    }
+
+
+def stats_summary(df: pd.DataFrame, state: str, date_range: Tuple[date, date],
+                  stats: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Summary statistics for one state's filtered rows, as offered for download
+
+    Pass the state_stats of `df` when they are already at hand; `df` itself is
+    then not read again.
+    """
+    if stats is None:
+        stats = state_stats(df)
+    row = stats.iloc[0]
+    return {
+        "state": state,
+        "date_range": f"{date_range[0]} to {date_range[1]}",
+        "total_records": int(row['Records']),
+        "total_samples": int(row['TotalSamples']),
+        "total_positive": int(row['Positive']),
+        "total_negative": int(row['Negative']),
+        "avg_positivity": float(row['AvgPositiveRatio']),
+        "max_daily_samples": int(row['MaxSamples']),
+        "min_daily_samples": int(row['MinSamples']),
+        "data_generated": str(date.today())
+    }
+
+
+def serialize_export(df: Optional[pd.DataFrame], fmt: str, state: str = None,
+                     date_range: Tuple[date, date] = None,
+                     stats: Optional[pd.DataFrame] = None) -> bytes:
+    """Encode filtered rows as a 'csv', 'json', 'json-compact' or 'stats' payload
+
+    The 'stats' payload can be built from the rows' precomputed state_stats
+    alone, in which case `df` may be None.
+    """
+    with stage(f'export.{fmt}', None if df is None else len(df)):
+        if fmt == 'csv':
+            return to_export_frame(df).to_csv(index=False).encode('utf-8')
+        if fmt in ('json', 'json-compact'):
+            return frame_to_json(df, pretty=fmt == 'json').encode('utf-8')
+        if fmt == 'stats':
+            return json.dumps(stats_summary(df, state, date_range, stats), indent=2).encode('utf-8')
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+# name -> (label, file extension, MIME type) of the streaming bulk export formats
+BULK_EXPORT_FORMATS = {
+    'csv.gz': ('Compressed CSV', 'csv.gz', 'application/gzip'),
+    'ndjson': ('NDJSON', 'ndjson', 'application/x-ndjson'),
+    'parquet': ('Parquet', 'parquet', 'application/vnd.apache.parquet')
+}
+
+# Rows serialised per step; bounds the working memory of a bulk export
+EXPORT_CHUNK_ROWS = 50000
+
+
+def _take_ranges(df: pd.DataFrame, ranges: List[Tuple[int, int]]) -> pd.DataFrame:
+    """Rows of `df` in the positional (start, stop) `ranges`, sliced when there is just one"""
+    if len(ranges) == 1:
+        return df.iloc[ranges[0][0]:ranges[0][1]]
+    return df.iloc[np.concatenate([np.arange(lo, hi) for lo, hi in ranges])]
+
+
+def iter_export_chunks(
+    df: pd.DataFrame,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    index: Optional[StateIndex] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """Selected rows in (State, Date) order, in chunks of `chunk_rows`
+
+    Consecutive states share a chunk, so a district-level dataset is not
+    written one short series at a time. Chunks of contiguous rows are
+    zero-copy slices.
+    """
+    if df.empty:
+        return
+    if index is None or index.n_rows != len(df):
+        index = StateIndex(df)
+    if not index.is_sorted:
+        # Unsorted frames are materialised once, then sliced the same way
+        rows = filter_data(df, states, date_range).sort_values(['State', 'Date'])
+        for start in range(0, len(rows), chunk_rows):
+            yield rows.iloc[start:start + chunk_rows]
+        return
+    start_date = end_date = None
+    if date_range and len(date_range) == 2:
+        start_date, end_date = (pd.Timestamp(d) for d in date_range)
+    wanted = set(states) if states else None
+    ranges, size = [], 0
+    for state in index.states():
+        if wanted is not None and state not in wanted:
+            continue
+        lo, hi = index.locate(state, start_date, end_date)
+        while lo < hi:
+            end = min(hi, lo + chunk_rows - size)
+            if ranges and ranges[-1][1] == lo:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((lo, end))
+            size += end - lo
+            lo = end
+            if size == chunk_rows:
+                yield _take_ranges(df, ranges)
+                ranges, size = [], 0
+    if ranges:
+        yield _take_ranges(df, ranges)
+
+
+def write_bulk_export(
+    df: pd.DataFrame,
+    fmt: str,
+    sink: BinaryIO,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    index: Optional[StateIndex] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> int:
+    """Stream the selected rows into `sink` chunk by chunk; returns rows written"""
+    chunks = iter_export_chunks(df, states, date_range, index, chunk_rows)
+    written = 0
+    if fmt == 'csv.gz':
+        # Level 6 compresses nearly as well as the default 9 at a fraction of the cost
+        with gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=6) as archive:
+            for chunk in chunks:
+                archive.write(to_export_frame(chunk).to_csv(index=False, header=written == 0)
+                              .encode('utf-8'))
+                written += len(chunk)
+            if written == 0:
+                archive.write(to_export_frame(df.iloc[0:0]).to_csv(index=False).encode('utf-8'))
+    elif fmt == 'ndjson':
+        for chunk in chunks:
+            sink.write(frame_to_json(chunk, lines=True).encode('utf-8'))
+            written += len(chunk)
+    elif fmt == 'parquet':
+        if pa is None:
+            raise ValueError("Parquet export requires pyarrow")
+        import pyarrow.parquet as pq
+        schema = pa.Schema.from_pandas(to_export_frame(df.iloc[0:0]), preserve_index=False)
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(to_export_frame(chunk), schema=schema,
+                                                        preserve_index=False))
+                written += len(chunk)
+    else:
+        raise ValueError(f"Unknown bulk export format: {fmt}")
+    return written
+
+
+def bulk_export_file(
+    df: pd.DataFrame,
+    fmt: str,
+    states: List[str] = None,
+    date_range: Tuple[date, date] = None,
+    index: Optional[StateIndex] = None
+) -> BinaryIO:
+    """Bulk export spooled to a temporary file, rewound and ready to read"""
+    sink = tempfile.TemporaryFile()
+    with stage(f'export.bulk.{fmt}') as timing:
+        timing['rows'] = write_bulk_export(df, fmt, sink, states, date_range, index)
+    sink.seek(0)
+    return sink
+
+
+def get_data_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    """Get comprehensive data summary"""
+    return summarize_state_stats(state_stats(df))
+
+def create_sample_data(
+    days: int = 730,
+    states: int = 20,
+    districts: int = 0,
+    seed: Optional[int] = None,
+    start: str = '2020-01-01'
+) -> pd.DataFrame:
+    """Create synthetic COVID-19 testing data in the cleaned load_data schema
+
+    Builds one cumulative series per state (or per synthetic district when
+    `districts` > 0) over `days` consecutive days, fully vectorised over a
+    series x day matrix, so tens of millions of rows take seconds. The same
+    `seed` always yields the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(STATE_POPULATION)[:states]
+    names += [f"Synthetic State {i + 1:03d}" for i in range(len(names), states)]
+    if districts > 0:
+        names = [f"{name} - District {d + 1:03d}" for name in names for d in range(districts)]
+    n_series = len(names)
+    dates = pd.date_range(start=start, periods=days, freq='D')
+
+    # Base values with some randomness
+    base_samples = rng.integers(1000, 5000, size=(n_series, days)).astype(np.float32)
+    # Add seasonality and trends
+    month_factor = (1 + (dates.month.to_numpy() - 1) * 0.1).astype(np.float32)
+    state_factor = (0.5 + (np.arange(n_series) % 10) * 0.1).astype(np.float32)
+    daily_samples = (base_samples * month_factor * state_factor[:, None]).astype(np.int64)
+    # Seasonal positivity with a per-series offset
+    positive_rate = 0.01 + np.sin(dates.month.to_numpy() * 0.5) * 0.005
+    positive_rate = positive_rate * rng.uniform(0.5, 1.5, size=(n_series, 1))
+    daily_positive = (daily_samples * positive_rate).astype(np.int64)
+
+    # Cumulative counts, like the real CSV
+    total_samples = np.cumsum(daily_samples, axis=1).ravel()
+    positive = np.cumsum(daily_positive, axis=1).ravel()
+    negative = total_samples - positive
+
+    df = pd.DataFrame({
+        'Date': np.tile(dates.to_numpy(), n_series),
+        'State': pd.Categorical.from_codes(
+            np.repeat(np.arange(n_series), days), categories=names
+        ),
+        'TotalSamples': total_samples,
+        'Negative': negative,
+        'Positive': positive
+    })
+    for col in NUMERIC_COLUMNS:
+        df[col] = df[col].astype(_count_dtype(df[col]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['PositiveRatio'] = np.where(
+            total_samples > 0, positive / total_samples, 0
+        ).round(RATIO_DECIMALS).astype(np.float32)
+    # Synthetic series are consistent by construction
+    df['Quality'] = np.zeros(len(df), dtype=np.uint8)
+    return df
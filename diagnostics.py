@@ -0,0 +1,134 @@
+# diagnostics.py
+"""Lightweight per-stage timing for the data pipeline and the pages"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# Number of stage timings kept in memory for the diagnostics page
+TIMING_HISTORY = 5000
+
+TIMING_COLUMNS = ['start', 'run', 'page', 'stage', 'ms', 'rows']
+
+# Structured log lines go to this logger; COVID_TIMING_LOG=1 prints them to stderr
+logger = logging.getLogger('covid_dashboard.timing')
+if os.environ.get('COVID_TIMING_LOG') and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_current_run: ContextVar[Optional[Dict[str, str]]] = ContextVar('covid_timing_run', default=None)
+
+
+class StageRecorder:
+    """Thread-safe ring buffer of the most recent stage timings"""
+
+    def __init__(self, max_records: int = TIMING_HISTORY):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Remove and return every buffered timing, oldest first"""
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+        return records
+
+    def frame(self) -> pd.DataFrame:
+        """All buffered timings, oldest first"""
+        with self._lock:
+            records = list(self._records)
+        timings = pd.DataFrame(records, columns=TIMING_COLUMNS)
+        timings['rows'] = pd.to_numeric(timings['rows'])
+        return timings
+
+
+# Process-wide buffer shared by every session
+RECORDER = StageRecorder()
+
+
+def start_run(page: str) -> str:
+    """Tag the timings recorded by the current script run with `page` and a run id"""
+    run_id = uuid.uuid4().hex[:8]
+    _current_run.set({'run': run_id, 'page': page})
+    return run_id
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Time the enclosed block as `name`; set ``info['rows']`` to record its output size"""
+    info = {'rows': rows}
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        run = _current_run.get() or {}
+        entry = {
+            'start': wall_start,
+            'run': run.get('run'),
+            'page': run.get('page'),
+            'stage': name,
+            'ms': elapsed,
+            'rows': info['rows'],
+        }
+        RECORDER.record(entry)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(entry))
+
+
+def record_timings(entries: List[Dict[str, Any]]) -> None:
+    """Record timings taken in a worker process under the current run"""
+    run = _current_run.get() or {}
+    for entry in entries:
+        RECORDER.record({**entry, 'run': run.get('run'), 'page': run.get('page')})
+
+
+def stage_percentiles(timings: pd.DataFrame,
+                      quantiles: Tuple[int, ...] = (50, 90, 99)) -> pd.DataFrame:
+    """Count, duration percentiles, max and mean rows per stage"""
+    labels = [f'p{q} ms' for q in quantiles]
+    if timings.empty:
+        return pd.DataFrame(columns=['Stage', 'Count'] + labels + ['Max ms', 'Mean rows'])
+    grouped = timings.groupby('stage')
+    summary = grouped['ms'].quantile([q / 100 for q in quantiles]).unstack()
+    summary.columns = labels
+    summary.insert(0, 'Count', grouped.size())
+    summary['Max ms'] = grouped['ms'].max()
+    summary['Mean rows'] = grouped['rows'].mean()
+    return summary.rename_axis('Stage').reset_index()
+
+
+def run_summary(timings: pd.DataFrame) -> pd.DataFrame:
+    """Wall-clock span and stage count of each recorded run, newest first"""
+    runs = timings.dropna(subset=['run'])
+    if runs.empty:
+        return pd.DataFrame(columns=['Run', 'Page', 'Started', 'Stages', 'Span ms'])
+    runs = runs.assign(end=runs['start'] + runs['ms'] / 1000)
+    grouped = runs.groupby('run')
+    summary = pd.DataFrame({
+        'Page': grouped['page'].first(),
+        'Started': pd.to_datetime(grouped['start'].min(), unit='s'),
+        'Stages': grouped.size(),
+        'Span ms': (grouped['end'].max() - grouped['start'].min()) * 1000,
+    })
+    return summary.rename_axis('Run').reset_index().sort_values('Started', ascending=False)
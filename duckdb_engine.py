@@ -0,0 +1,205 @@
+# duckdb_engine.py
+"""Optional DuckDB query engine: filters and aggregations run as SQL in-process"""
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import data_core
+
+try:
+    import duckdb
+except ImportError:  # optional engine; the pandas path needs nothing extra
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+
+class DuckDBEngine:
+    """Cleaned dataset registered in an in-process DuckDB database as ``testing``
+
+    The source may be a pandas frame (scanned in place, e.g. a Dataset view),
+    a Parquet file (scanned from disk), an Arrow IPC file such as the load
+    cache or an ingest.py dataset (memory-mapped), or a CSV or snapshot
+    directory, which is cleaned once by load_frame and then served from its
+    Arrow cache. Only result rows
+    come back as pandas, with the same order, index labels and dtypes as the
+    data_core functions.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, source: Union[str, pd.DataFrame], database: str = ':memory:'):
+        if duckdb is None:
+            raise ImportError("The DuckDB engine requires the duckdb package")
+        self._con = duckdb.connect(database)
+        # Registered sources are local to this connection, so queries share it
+        self._lock = threading.Lock()
+        scan = self._scan(source)
+        if isinstance(scan, duckdb.DuckDBPyRelation):
+            scan.create_view('testing')
+        else:
+            self._con.register('testing', scan)
+        with self._lock:
+            schema = self._con.execute("SELECT * FROM testing LIMIT 0").df()
+            states = self._con.execute(
+                "SELECT DISTINCT CAST(State AS VARCHAR) AS State FROM testing ORDER BY State"
+            ).df()['State'].tolist()
+        schema.pop('_row')
+        self.columns = list(schema.columns)
+        self._dtypes = {col: schema[col].dtype for col in self.columns}
+        self._dtypes['Date'] = np.dtype('datetime64[ns]')
+        self._dtypes['State'] = pd.CategoricalDtype(states)
+
+    def _scan(self, source: Union[str, pd.DataFrame]) -> Any:
+        """Object to register as ``testing``, carrying source row labels as ``_row``"""
+        if isinstance(source, pd.DataFrame):
+            frame = source.copy(deep=False)
+            frame['_row'] = source.index.to_numpy()
+            return frame
+        extension = os.path.splitext(source)[1].lower()
+        if extension == '.parquet':
+            return self._con.sql(
+                "SELECT * EXCLUDE (file_row_number), file_row_number AS _row "
+                "FROM read_parquet(?, file_row_number = true)", params=[source]
+            )
+        if extension == '.csv' or data_core.is_snapshot_source(source):
+            df = data_core.load_frame(source)
+            cache_file = data_core._cache_path(source)
+            if not os.path.exists(cache_file):
+                return self._scan(df)
+            source = cache_file
+        if pa is None:
+            raise ImportError("Reading Arrow files requires pyarrow")
+        table = pa_ipc.open_file(pa.memory_map(source, 'r')).read_all()
+        return table.append_column('_row', pa.array(np.arange(table.num_rows)))
+
+    def _query(self, sql: str, params: List[Any]) -> pd.DataFrame:
+        with self._lock:
+            return self._con.execute(sql, params).df()
+
+    def _where(self, states: Optional[List[str]], date_range: Optional[Tuple[date, date]],
+               positive_range: Optional[Tuple[int, int]] = None) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters matching filter_data's semantics"""
+        clauses, params = ['TRUE'], []
+        if states and len(states) > 0:
+            clauses.append("list_contains(?::VARCHAR[], CAST(State AS VARCHAR))")
+            params.append(list(states))
+        if date_range and len(date_range) == 2:
+            clauses.append("Date BETWEEN ? AND ?")
+            params.extend(pd.Timestamp(d).to_pydatetime() for d in date_range)
+        if positive_range and 'Positive' in self.columns:
+            clauses.append("Positive BETWEEN ? AND ?")
+            params.extend(int(v) for v in positive_range)
+        return ' AND '.join(clauses), params
+
+    def filter_data(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        """Rows like data_core.filter_data: State ascending, Date descending"""
+        where, params = self._where(states, date_range, positive_range)
+        rows = self._query(
+            f"SELECT * FROM testing WHERE {where} ORDER BY State, Date DESC", params
+        )
+        index = pd.Index(rows.pop('_row').to_numpy())
+        return rows.astype(self._dtypes).set_axis(index, axis=0)
+
+    def aggregate_by_state(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        metric: str = 'TotalSamples'
+    ) -> pd.DataFrame:
+        """Total, Average, Peak and Latest of `metric` per state, as aggregate_by_state"""
+        if metric not in self.columns or metric in ('State', 'Date'):
+            raise ValueError(f"Unknown metric: {metric}")
+        where, params = self._where(states, date_range)
+        agg_df = self._query(
+            f'SELECT CAST(State AS VARCHAR) AS State, '
+            f'SUM(CAST("{metric}" AS DOUBLE)) AS Total, '
+            f'AVG(CAST("{metric}" AS DOUBLE)) AS Average, '
+            f'MAX(CAST("{metric}" AS DOUBLE)) AS Peak, '
+            f'arg_max(CAST("{metric}" AS DOUBLE), Date) AS Latest '
+            f'FROM testing WHERE {where} GROUP BY 1 ORDER BY 1', params
+        )
+        if agg_df.empty:
+            return pd.DataFrame(columns=data_core.AGGREGATE_COLUMNS)
+        if pd.api.types.is_integer_dtype(self._dtypes[metric]):
+            agg_df = agg_df.astype({'Total': np.int64, 'Peak': np.int64, 'Latest': np.int64})
+        return agg_df.astype({'State': object})
+
+    def aggregate_by_month(
+        self,
+        state: str,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        """Monthly sums and PositiveRatio for one state, as aggregate_by_month"""
+        columns = ['TotalSamples', 'Positive', 'Negative']
+        where, params = self._where([state], date_range, positive_range)
+        sums = ', '.join(f'CAST(SUM("{col}") AS BIGINT) AS "{col}"' for col in columns)
+        monthly_stats = self._query(
+            f"SELECT strftime(Date, '%Y-%m') AS Month, {sums} "
+            f"FROM testing WHERE {where} GROUP BY 1 ORDER BY 1", params
+        )
+        if monthly_stats.empty:
+            return pd.DataFrame(columns=['Month'] + columns + ['PositiveRatio'])
+        monthly_stats['Month'] = monthly_stats['Month'].astype(object)
+        monthly_stats['PositiveRatio'] = monthly_stats['Positive'] / monthly_stats['TotalSamples']
+        return monthly_stats
+
+    def summary(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None
+    ) -> Dict[str, Any]:
+        """The get_data_summary dictionary, computed in SQL"""
+        where, params = self._where(states, date_range)
+        totals = self._query(
+            f"SELECT COUNT(*) AS records, COUNT(DISTINCT State) AS states, "
+            f"MIN(Date) AS start, MAX(Date) AS end, "
+            f"CAST(SUM(TotalSamples) AS BIGINT) AS TotalSamples, "
+            f"CAST(SUM(Positive) AS BIGINT) AS Positive, "
+            f"CAST(SUM(Negative) AS BIGINT) AS Negative, "
+            f"AVG(CAST(PositiveRatio AS DOUBLE)) AS ratio "
+            f"FROM testing WHERE {where}", params
+        ).iloc[0]
+        if not totals['records']:
+            return {}
+        # First row holding the maximum, as idxmax picks it
+        peak = self._query(
+            f"SELECT Date, Positive, CAST(State AS VARCHAR) AS State FROM testing "
+            f"WHERE {where} ORDER BY Positive DESC, _row LIMIT 1", params
+        ).iloc[0]
+        highest = self._query(
+            f"SELECT CAST(State AS VARCHAR) AS State, AVG(CAST(PositiveRatio AS DOUBLE)) AS ratio "
+            f"FROM testing WHERE {where} GROUP BY 1 ORDER BY ratio DESC, State LIMIT 3", params
+        )
+        return {
+            'total_records': int(totals['records']),
+            'total_states': int(totals['states']),
+            'date_range': {
+                'start': totals['start'].strftime('%Y-%m-%d'),
+                'end': totals['end'].strftime('%Y-%m-%d')
+            },
+            'total_samples': int(totals['TotalSamples']),
+            'total_positive': int(totals['Positive']),
+            'total_negative': int(totals['Negative']),
+            'avg_positive_ratio': float(totals['ratio']),
+            'peak_positive_day': {
+                'date': peak['Date'].strftime('%Y-%m-%d'),
+                'value': int(peak['Positive']),
+                'state': peak['State']
+            },
+            'states_with_highest_positivity': dict(zip(highest['State'], highest['ratio']))
+        }
@@ -0,0 +1,41 @@
+# ingest.py
+"""Clean the source CSV once and publish it as a memory-mappable Arrow dataset.
+
+Usage:
+    python ingest.py --output /srv/covid/dataset.arrow
+    COVID_ARROW_DATASET=/srv/covid/dataset.arrow streamlit run Home.py
+
+Every server process started with COVID_ARROW_DATASET maps the published file
+read-only instead of parsing the CSV, so the host's page cache holds the data
+once however many processes serve it. Re-running the ingest replaces the file
+atomically; servers pick up the new data on their next rerun.
+"""
+import argparse
+import os
+import time
+
+import data_core
+from manifest import ARROW_DATASET_ENV, manifest_path, write_manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=data_core.DATA_FILE,
+                        help="Source CSV, or a directory or glob of snapshot CSVs")
+    parser.add_argument('--output', default=os.environ.get(ARROW_DATASET_ENV, 'dataset.arrow'),
+                        help=f"Arrow file to publish (defaults to ${ARROW_DATASET_ENV})")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    df = data_core.load_frame(args.source)
+    data_core.write_dataset(df, args.output, args.source)
+    # The landing page reads the manifest that sits next to the published file
+    write_manifest(args.output, data_core.dataset_manifest(df, args.source))
+
+    print(f"{len(df):,} rows from {args.source} -> {args.output} "
+          f"(+ {manifest_path(args.output)}, {time.perf_counter() - started:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# manifest.py
+"""Dataset metadata written at ingest, readable with the standard library only
+
+Home.py renders its headline numbers from this file, so the landing page
+never imports pandas or touches the CSV.
+"""
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+# Bump when the manifest fields change; older manifests are then ignored
+MANIFEST_VERSION = 1
+
+# Bundled CSV loaded when no other source is configured
+DATA_FILE = "StatewiseTestingDetails.csv"
+
+# Path of the Arrow dataset published by ingest.py; when set, servers map it
+# instead of parsing the CSV and the landing page reads the manifest beside it
+ARROW_DATASET_ENV = 'COVID_ARROW_DATASET'
+
+# Source to load instead of the bundled CSV: a CSV file, a directory of daily
+# snapshot CSVs or a glob such as ``snapshots/*.csv``
+DATA_SOURCE_ENV = 'COVID_DATA_SOURCE'
+
+GLOB_CHARACTERS = '*?['
+
+
+def is_glob(source: str) -> bool:
+    """Whether `source` is a shell-style pattern rather than a single path"""
+    return any(ch in source for ch in GLOB_CHARACTERS)
+
+
+def source_stem(source: str) -> str:
+    """Path the files derived from `source` (cache, manifest) are named after
+
+    A file drops its extension; a snapshot directory keeps its name, and a
+    glob uses the directory before its first wildcard, so the derived files
+    sit next to the snapshot directory rather than inside it.
+    """
+    if is_glob(source):
+        parts = []
+        for part in source.replace(os.sep, '/').split('/'):
+            if is_glob(part):
+                break
+            parts.append(part)
+        return os.path.abspath('/'.join(parts) or '.')
+    if os.path.isdir(source):
+        return os.path.normpath(source)
+    root, _ = os.path.splitext(source)
+    return root
+
+
+def manifest_path(source: str) -> str:
+    """Location of the manifest that sits next to the source CSV or snapshot directory"""
+    return f"{source_stem(source)}.manifest.json"
+
+
+def read_manifest(source: str) -> Optional[Dict[str, Any]]:
+    """Metadata of the last ingest of `source`, or None if it was never written"""
+    try:
+        with open(manifest_path(source), encoding='utf-8') as fh:
+            metadata = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(metadata, dict) or metadata.get('manifest_version') != MANIFEST_VERSION:
+        return None
+    return metadata
+
+
+def write_manifest(source: str, metadata: Dict[str, Any]) -> None:
+    """Atomically replace the manifest of `source`; read-only deploys skip it"""
+    path = manifest_path(source)
+    try:
+        fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(path) + '.',
+                                        suffix='.tmp', dir=os.path.dirname(path) or '.')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump({'manifest_version': MANIFEST_VERSION, **metadata}, fh, indent=2)
+        # mkstemp creates owner-only files; other server processes must read it
+        os.chmod(tmp_file, 0o644)
+        os.replace(tmp_file, path)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
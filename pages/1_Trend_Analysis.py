@@ -2,9 +2,14 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils import load_data, filter_data
+from utils import (
+    load_dataset, load_query_engine, aggregate_by_state, with_metric, downsample_series,
+    load_figure_cache, figure_cache_key, DERIVED_METRICS
+)
+from diagnostics import start_run, stage
 
 st.set_page_config(layout="wide")
+start_run("Trend Analysis")
 st.title("📈 COVID-19 Testing Trends")
 
 # Apply the same dark theme CSS as home page
@@ -278,15 +283,19 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load data with progress indicator
-with st.spinner('Loading data...'):
-    df = load_data()
-    if df.empty:
+with st.spinner('Loading data...'), stage('trend.load') as timing:
+    dataset = load_dataset()
+    if dataset is None or dataset.empty:
         st.error("No valid data available. Please check your data file.")
         st.stop()
+    # Shared read-only data: the view, index, cube and metrics are never copied per session
+    df, index = dataset.view(), dataset.index
+    engine = load_query_engine(dataset)
+    timing['rows'] = len(df)
 
 # Sidebar Filters
 st.sidebar.header("Filter Options")
-available_states = sorted(df['State'].dropna().unique())
+available_states = index.states()
 states = st.sidebar.multiselect(
     "Select States",
     options=available_states,
@@ -294,11 +303,12 @@ states = st.sidebar.multiselect(
     help="Select states to compare"
 )
 
+min_date, max_date = df['Date'].min().date(), df['Date'].max().date()
 date_range = st.sidebar.date_input(
     "Date Range",
-    value=[df['Date'].min(), df['Date'].max()],
-    min_value=df['Date'].min(),
-    max_value=df['Date'].max()
+    value=[min_date, max_date],
+    min_value=min_date,
+    max_value=max_date
 )
 
 # Metric selection with availability check
@@ -308,43 +318,126 @@ available_metrics = {
     'Negative': 'Negative Cases',
     'PositiveRatio': 'Positive Rate'
 }
+# Derived metrics are only computed once someone selects them
+available_metrics.update({name: meta['label'] for name, meta in DERIVED_METRICS.items()})
 selected_metric = st.sidebar.selectbox(
     "Select Metric",
     options=list(available_metrics.keys()),
     format_func=lambda x: available_metrics[x]
 )
 
+# Chart downsampling
+downsample = st.sidebar.checkbox(
+    "Downsample trend chart",
+    value=True,
+    help="Thin each series with LTTB so large selections stay responsive; peaks are kept"
+)
+max_points = st.sidebar.slider(
+    "Max points per series",
+    min_value=100,
+    max_value=2000,
+    value=800,
+    step=100,
+    disabled=not downsample,
+    help="Roughly one point per horizontal pixel of the chart"
+)
+
 # Data Processing
-filtered_df = filter_data(df, states, date_range)
+with stage('trend.filter') as timing:
+    filtered_df = engine.filter_data(states, date_range)
+    timing['rows'] = len(filtered_df)
+with stage('trend.metric', len(filtered_df)):
+    filtered_df = with_metric(filtered_df, df, selected_metric, index, dataset.metrics)
 
 # Visualization Tabs
 tab1, tab2 = st.tabs(["Trend Analysis", "State Comparison"])
 
+figure_cache = load_figure_cache()
+
+
+def build_trend_figure():
+    """Line chart plus (shown, total) point counts, or None without data"""
+    # Drop rows where selected metric is NA
+    plot_df = filtered_df.dropna(subset=[selected_metric])
+    total_points = len(plot_df)
+    if downsample:
+        plot_df = downsample_series(plot_df, selected_metric, max_points)
+    if plot_df.empty:
+        return None
+
+    fig = px.line(
+        plot_df,
+        x='Date',
+        y=selected_metric,
+        color='State',
+        title=f"{available_metrics[selected_metric]} Over Time",
+        labels={selected_metric: available_metrics[selected_metric]},
+        height=600,
+        template='plotly_dark'  # Use dark theme for plotly
+    )
+    fig.update_layout(
+        hovermode="x unified",
+        xaxis_title="Date",
+        yaxis_title=available_metrics[selected_metric],
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#e0e7ff')
+    )
+    return fig, (len(plot_df), total_points)
+
+
+def build_comparison_figure():
+    """Bar chart plus the per-state aggregate table"""
+    if selected_metric in df.columns:
+        agg_df = engine.aggregate_by_state(states, date_range, selected_metric)
+    else:
+        agg_df = aggregate_by_state(filtered_df, states, date_range, selected_metric)
+
+    fig = px.bar(
+        agg_df,
+        x='State',
+        y='Total',
+        color='State',
+        title=f"Total {available_metrics[selected_metric]} by State",
+        text_auto='.2s',
+        height=500,
+        template='plotly_dark'  # Use dark theme for plotly
+    )
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#e0e7ff')
+    )
+    return fig, agg_df
+
+
+def cached_figure(chart, build, **options):
+    """Figure for the current query, built at most once per process
+
+    The validated figure object is cached, not its JSON, so a hit skips both
+    rebuilding and re-validating it. Entries are budgeted by serialised size.
+    """
+    key = figure_cache_key(chart, dataset.version, states, date_range, selected_metric, **options)
+    cached = figure_cache.get(key)
+    if cached is None:
+        with stage(f'trend.{chart}_figure', len(filtered_df)):
+            cached = build()
+            if cached is not None:
+                figure_cache.put(key, cached, len(cached[0].to_json()))
+    return cached
+
+
 with tab1:
     if not filtered_df.empty:
-        # Drop rows where selected metric is NA
-        plot_df = filtered_df.dropna(subset=[selected_metric])
-
-        if not plot_df.empty:
-            fig = px.line(
-                plot_df,
-                x='Date',
-                y=selected_metric,
-                color='State',
-                title=f"{available_metrics[selected_metric]} Over Time",
-                labels={selected_metric: available_metrics[selected_metric]},
-                height=600,
-                template='plotly_dark'  # Use dark theme for plotly
-            )
-            fig.update_layout(
-                hovermode="x unified",
-                xaxis_title="Date",
-                yaxis_title=available_metrics[selected_metric],
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#e0e7ff')
-            )
+        trend = cached_figure(
+            'line', build_trend_figure,
+            downsample=downsample, max_points=max_points if downsample else None
+        )
+
+        if trend is not None:
+            fig, (shown_points, total_points) = trend
             st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"Showing {shown_points:,} of {total_points:,} points")
         else:
             st.warning(
                 f"No valid {available_metrics[selected_metric]} data for selected filters")
@@ -355,35 +448,20 @@ with tab2:
     if not filtered_df.empty:
         # Ensure we have valid numeric data
         if pd.api.types.is_numeric_dtype(filtered_df[selected_metric]):
-            agg_df = filtered_df.groupby('State', observed=True).agg(
-                Total=pd.NamedAgg(column=selected_metric, aggfunc='sum'),
-                Average=pd.NamedAgg(column=selected_metric, aggfunc='mean'),
-                Peak=pd.NamedAgg(column=selected_metric, aggfunc='max')
-            ).reset_index()
-
-            fig = px.bar(
-                agg_df,
-                x='State',
-                y='Total',
-                color='State',
-                title=f"Total {available_metrics[selected_metric]} by State",
-                text_auto='.2s',
-                height=500,
-                template='plotly_dark'  # Use dark theme for plotly
-            )
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#e0e7ff')
-            )
+            fig, agg_df = cached_figure('bar', build_comparison_figure)
             st.plotly_chart(fig, use_container_width=True)
 
-            # Show data table
+            # Show data table; ratios and other float metrics need their decimals
+            if pd.api.types.is_integer_dtype(filtered_df[selected_metric]):
+                value_format, average_format = '{:,.0f}', '{:,.2f}'
+            else:
+                value_format = average_format = '{:,.4f}'
             st.dataframe(
                 agg_df.style.format({
-                    'Total': '{:,.0f}',
-                    'Average': '{:,.2f}',
-                    'Peak': '{:,.0f}'
+                    'Total': value_format,
+                    'Average': average_format,
+                    'Peak': value_format,
+                    'Latest': value_format
                 }).applymap(lambda x: 'color: #e0e7ff'),
                 use_container_width=True
             )
@@ -1,16 +1,18 @@
 # pages/2_Data_Explorer.py
 import streamlit as st
-import pandas as pd
-import json
-import numpy as np
-from datetime import date
-from utils import load_data
+from functools import partial
+from utils import (
+    load_dataset, load_query_engine, filter_stats, export_payload, bulk_export_file,
+    aggregate_by_month, filter_quality, quality_labels, BULK_EXPORT_FORMATS, QUALITY_FLAGS
+)
+from diagnostics import start_run, stage
 
 st.set_page_config(
     page_title="Data Explorer",
     page_icon="🔍",
     layout="wide"
 )
+start_run("Data Explorer")
 
 # Apply dark theme CSS (consistent with homepage)
 st.markdown("""
@@ -94,31 +96,16 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-class DateTimeEncoder(json.JSONEncoder):
-    """Custom JSON encoder for date serialization"""
-    def default(self, obj):
-        if isinstance(obj, (date, pd.Timestamp)):
-            return obj.isoformat()
-        elif isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super().default(obj)
-
-# Load data with caching
-@st.cache_data
-def load_cached_data():
-    return load_data()
-
-# Load and display data info
-with st.spinner('Loading data...'):
-    df = load_cached_data()
+# Load and display data info; the dataset is shared read-only by every session
+with st.spinner('Loading data...'), stage('explorer.load') as timing:
+    dataset = load_dataset()
+    timing['rows'] = len(dataset) if dataset is not None else 0
     
-if df.empty:
+if dataset is None or dataset.empty:
     st.error("❌ No data available. Please check the data file.")
     st.stop()
+df, index = dataset.view(), dataset.index
+engine = load_query_engine(dataset)
 
 # Display data overview
 st.subheader("📊 Data Overview")
@@ -128,7 +115,7 @@ with col1:
 with col2:
     st.metric("States/UTs", f"{df['State'].nunique()}")
 with col3:
-    st.metric("Date Range", f"{df['Date'].min()} to {df['Date'].max()}")
+    st.metric("Date Range", f"{df['Date'].min():%Y-%m-%d} to {df['Date'].max():%Y-%m-%d}")
 with col4:
     total_samples = df['TotalSamples'].sum() if 'TotalSamples' in df.columns else 0
     st.metric("Total Samples", f"{total_samples:,}")
@@ -137,7 +124,7 @@ with col4:
 st.sidebar.header("🔧 Filter Options")
 
 # State selection
-state_options = sorted(df['State'].dropna().unique())
+state_options = index.states()
 selected_state = st.sidebar.selectbox(
     "Select State",
     options=state_options,
@@ -146,11 +133,12 @@ selected_state = st.sidebar.selectbox(
 )
 
 # Date range selection
+min_date, max_date = df['Date'].min().date(), df['Date'].max().date()
 date_range = st.sidebar.date_input(
     "Select Date Range",
-    value=[df['Date'].min(), df['Date'].max()],
-    min_value=df['Date'].min(),
-    max_value=df['Date'].max(),
+    value=[min_date, max_date],
+    min_value=min_date,
+    max_value=max_date,
     help="Select start and end dates"
 )
 
@@ -167,24 +155,34 @@ if 'Positive' in df.columns:
         help="Filter by number of positive cases"
     )
 
+# Data-quality filter over the flags computed when the data was loaded
+quality_mode = st.sidebar.radio(
+    "Data Quality",
+    options=['all', 'flagged', 'clean'],
+    format_func={'all': "All rows", 'flagged': "Flagged rows only", 'clean': "Hide flagged rows"}.get,
+    help="Rows with blank counts, falling cumulative counts or Positive + Negative ≠ TotalSamples"
+)
+quality_flags = st.sidebar.multiselect(
+    "Quality Flags",
+    options=list(QUALITY_FLAGS),
+    default=list(QUALITY_FLAGS),
+    format_func=lambda name: QUALITY_FLAGS[name][1],
+    disabled=quality_mode == 'all'
+)
+quality = (quality_mode, tuple(quality_flags)) if quality_mode != 'all' else None
+
 # Show sample count
 st.sidebar.markdown("---")
 st.sidebar.info(f"**Available Records:** {len(df)}")
 
 # Filter Data
 try:
-    filtered_data = df[
-        (df['State'] == selected_state) &
-        (df['Date'].between(*date_range))
-    ]
-    
-    if 'Positive' in df.columns:
-        filtered_data = filtered_data[
-            (filtered_data['Positive'] >= positive_min) &
-            (filtered_data['Positive'] <= positive_max)
-        ]
-    
-    filtered_data = filtered_data.sort_values('Date', ascending=False)
+    positive_range = (positive_min, positive_max) if 'Positive' in df.columns else None
+    with stage('explorer.filter') as timing:
+        filtered_data = engine.filter_data([selected_state], date_range, positive_range)
+        if quality is not None:
+            filtered_data = filter_quality(filtered_data, *quality)
+        timing['rows'] = len(filtered_data)
     
     # Display filtered results summary
     st.subheader(f"📋 {selected_state} - Filtered Results")
@@ -193,14 +191,19 @@ try:
         st.warning(f"No data found for {selected_state} in the selected date range.")
     else:
         # Show summary metrics
-        st.info(f"**Found {len(filtered_data)} records** from {filtered_data['Date'].min()} to {filtered_data['Date'].max()}")
+        st.info(f"**Found {len(filtered_data)} records** from {filtered_data['Date'].min():%Y-%m-%d} to {filtered_data['Date'].max():%Y-%m-%d}")
         
-        # Display data table
+        # Display data table, with the quality flags spelled out
+        issues = quality_labels(filtered_data['Quality'])
         st.dataframe(
-            filtered_data,
+            filtered_data.assign(Issues=issues.where(issues == '', '⚠️ ' + issues)),
             use_container_width=True,
             hide_index=True,
             column_config={
+                "Quality": None,
+                "Issues": st.column_config.TextColumn(
+                    help="Data-quality flags raised when the data was loaded"
+                ),
                 "Date": st.column_config.DateColumn(
                     format="YYYY-MM-DD",
                     help="Test date"
@@ -232,51 +235,39 @@ try:
         st.subheader("📤 Export Data")
         col1, col2, col3 = st.columns(3)
         
+        # Payloads are generated only when a download is clicked, and cached per
+        # dataset version and filter
+        export_filter = (dataset.version, selected_state, tuple(date_range), positive_range,
+                         quality)
+        
         with col1:
-            csv_data = filtered_data.to_csv(index=False)
             st.download_button(
                 label="💾 Download CSV",
-                data=csv_data,
+                data=partial(export_payload, 'csv', *export_filter),
                 file_name=f"{selected_state}_covid_data_{date_range[0]}_to_{date_range[1]}.csv",
                 mime="text/csv",
+                on_click="ignore",
                 help="Download filtered data as CSV file"
             )
         
         with col2:
-            json_data = json.dumps(
-                filtered_data.to_dict(orient='records'),
-                cls=DateTimeEncoder,
-                indent=2
-            )
+            compact_json = st.checkbox("Compact JSON", value=False, help="Skip indentation for a smaller file")
             st.download_button(
                 label="📥 Download JSON",
-                data=json_data,
+                data=partial(export_payload, 'json-compact' if compact_json else 'json', *export_filter),
                 file_name=f"{selected_state}_covid_data_{date_range[0]}_to_{date_range[1]}.json",
                 mime="application/json",
+                on_click="ignore",
                 help="Download filtered data as JSON file"
             )
         
         with col3:
-            # Statistics summary
-            stats_summary = {
-                "state": selected_state,
-                "date_range": f"{date_range[0]} to {date_range[1]}",
-                "total_records": len(filtered_data),
-                "total_samples": int(filtered_data['TotalSamples'].sum()),
-                "total_positive": int(filtered_data['Positive'].sum()),
-                "total_negative": int(filtered_data['Negative'].sum()),
-                "avg_positivity": float(filtered_data['PositiveRatio'].mean()),
-                "max_daily_samples": int(filtered_data['TotalSamples'].max()),
-                "min_daily_samples": int(filtered_data['TotalSamples'].min()),
-                "data_generated": str(date.today())
-            }
-            
-            stats_json = json.dumps(stats_summary, indent=2, cls=DateTimeEncoder)
             st.download_button(
                 label="📊 Download Summary Stats",
-                data=stats_json,
+                data=partial(export_payload, 'stats', *export_filter),
                 file_name=f"{selected_state}_stats_summary.json",
                 mime="application/json",
+                on_click="ignore",
                 help="Download summary statistics"
             )
         
@@ -284,29 +275,38 @@ try:
         st.subheader("📈 Quick Statistics")
         
         if len(filtered_data) > 1:
+            with stage('explorer.stats', len(filtered_data)):
+                stats = filter_stats(dataset.version, (selected_state,), tuple(date_range),
+                                     positive_range, quality).iloc[0]
             cols = st.columns(4)
             with cols[0]:
                 st.metric(
                     "Avg Daily Samples",
-                    f"{filtered_data['TotalSamples'].mean():,.0f}"
+                    f"{stats['AvgSamples']:,.0f}"
                 )
             with cols[1]:
                 st.metric(
                     "Avg Daily Positive",
-                    f"{filtered_data['Positive'].mean():,.0f}"
+                    f"{stats['AvgPositive']:,.0f}"
                 )
             with cols[2]:
                 st.metric(
                     "Peak Positivity Day",
-                    filtered_data.loc[filtered_data['PositiveRatio'].idxmax(), 'Date'].strftime("%b %d, %Y")
-                    if 'PositiveRatio' in filtered_data.columns else "N/A"
+                    stats['PeakRatioDate'].strftime("%b %d, %Y")
                 )
             with cols[3]:
                 st.metric(
                     "Max Daily Positive",
-                    f"{filtered_data['Positive'].max():,.0f}"
+                    f"{stats['MaxPositive']:,.0f}"
                 )
         
+        # Per-state quality summary, computed once for the shared dataset
+        with st.expander("🩺 Data Quality", expanded=False):
+            state_quality = dataset.quality.set_index('State').loc[selected_state]
+            st.caption(f"{state_quality['Flagged']:,} of {state_quality['Records']:,} "
+                       f"{selected_state} records carry at least one quality flag.")
+            st.dataframe(dataset.quality, use_container_width=True, hide_index=True)
+        
         # Data preview in different formats
         with st.expander("👁️ Data Preview", expanded=False):
             tab1, tab2, tab3 = st.tabs(["Raw Data", "Top 10 Days", "Monthly Aggregation"])
@@ -321,20 +321,51 @@ try:
             
             with tab3:
                 if len(filtered_data) > 30:
-                    # Create monthly aggregation
-                    filtered_data['Month'] = pd.to_datetime(filtered_data['Date']).dt.to_period('M')
-                    monthly_stats = filtered_data.groupby('Month').agg({
-                        'TotalSamples': 'sum',
-                        'Positive': 'sum',
-                        'Negative': 'sum'
-                    }).reset_index()
-                    monthly_stats['Month'] = monthly_stats['Month'].astype(str)
-                    monthly_stats['PositiveRatio'] = monthly_stats['Positive'] / monthly_stats['TotalSamples']
+                    # Create monthly aggregation; only a narrowed positive range is
+                    # passed on, so the full range can be answered from the rollup cube
+                    positive_filtered = 'Positive' in df.columns and (positive_min, positive_max) != (
+                        int(df['Positive'].min()), int(df['Positive'].max()))
+                    with stage('explorer.monthly') as timing:
+                        if quality is not None:
+                            # Quality-filtered rows are aggregated directly
+                            monthly_stats = aggregate_by_month(filtered_data, selected_state, date_range)
+                        else:
+                            monthly_stats = engine.aggregate_by_month(
+                                selected_state,
+                                date_range,
+                                positive_range if positive_filtered else None
+                            )
+                        timing['rows'] = len(monthly_stats)
                     st.dataframe(monthly_stats, use_container_width=True)
         
 except Exception as e:
     st.error(f"❌ Error processing data: {str(e)}")
 
+# Bulk export across any set of states, streamed in chunks
+with st.expander("📦 Bulk Export", expanded=False):
+    bulk_states = st.multiselect(
+        "States to export",
+        options=state_options,
+        default=state_options,
+        help="Rows for every selected state within the sidebar date range"
+    )
+    bulk_format = st.radio(
+        "Format",
+        options=list(BULK_EXPORT_FORMATS),
+        format_func=lambda fmt: BULK_EXPORT_FORMATS[fmt][0],
+        horizontal=True
+    )
+    _, extension, mime = BULK_EXPORT_FORMATS[bulk_format]
+    st.download_button(
+        label="📦 Download Bulk Export",
+        data=partial(bulk_export_file, df, bulk_format, bulk_states, date_range, index),
+        file_name=f"covid_data_{len(bulk_states)}_states_{date_range[0]}_to_{date_range[-1]}.{extension}",
+        mime=mime,
+        on_click="ignore",
+        disabled=not bulk_states,
+        help="Generated on click; rows are written in chunks so memory stays bounded"
+    )
+
 # Footer
 st.markdown("---")
 st.markdown("""
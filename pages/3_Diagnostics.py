@@ -0,0 +1,368 @@
+# pages/3_Diagnostics.py
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from diagnostics import RECORDER, TIMING_HISTORY, run_summary, stage_percentiles
+
+st.set_page_config(layout="wide")
+st.title("🩺 Pipeline Diagnostics")
+
+# Apply the same dark theme CSS as home page
+st.markdown("""
+<style>
+    /* ===== DARK THEME COLORS ===== */
+    /* Base text color for all elements */
+    body, .stApp, [data-testid="stAppViewContainer"], 
+    [data-testid="stSidebar"], .stMarkdown, .stMarkdown p,
+    .stMarkdown div, .stMarkdown span, .st-emotion-cache-10trblm {
+        color: #e0e7ff !important;
+    }
+    
+    /* Headings color */
+    h1, h2, h3, h4, h5, h6,
+    .stMarkdown h1, .stMarkdown h2, .stMarkdown h3,
+    .stMarkdown h4, .stMarkdown h5, .stMarkdown h6,
+    .metric-card h3, .header-container h3,
+    .st-emotion-cache-10trblm, .st-emotion-cache-16idsys {
+        color: #ffffff !important;
+    }
+    
+    /* Secondary text color */
+    .stMarkdown p, .metric-card p, .header-container p,
+    .footer, .stHelp, .stDateInput, .stSelectbox,
+    .stRadio, .stMultiselect, .stMetricLabel,
+    .st-emotion-cache-p5msec, .st-emotion-cache-q8sbsg {
+        color: #a3b3cc !important;
+    }
+
+    /* ===== SPECIFIC ELEMENT STYLES ===== */
+    /* Main Page Gradient - Dark Blue/Purple */
+    [data-testid="stAppViewContainer"] {
+        background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%);
+    }
+
+    /* Sidebar Gradient - Dark Blue */
+    [data-testid="stSidebar"] {
+        background: linear-gradient(160deg, #1a1a2e 0%, #16213e 100%) !important;
+        border-right: 1px solid #2a3a5a;
+    }
+
+    /* Sidebar Navigation */
+    [data-testid="stSidebarNav"] ul {
+        padding-left: 1rem;
+    }
+    
+    [data-testid="stSidebarNav"] a {
+        color: #e0e7ff !important;
+        font-weight: 600;
+        padding: 0.5rem 0;
+        display: block;
+        text-decoration: none;
+        transition: all 0.2s ease;
+    }
+    
+    [data-testid="stSidebarNav"] a:hover {
+        color: #ffffff !important;
+        transform: translateX(3px);
+        text-shadow: 0 0 8px rgba(255, 255, 255, 0.5);
+    }
+
+    /* Widget Containers */
+    [data-testid="stSidebar"] .stSelectbox,
+    [data-testid="stSidebar"] .stMultiselect,
+    [data-testid="stSidebar"] .stRadio,
+    [data-testid="stSidebar"] .stDateInput {
+        background-color: rgba(26, 32, 58, 0.8);
+        border-radius: 10px;
+        padding: 12px;
+        margin-bottom: 1.25rem;
+        border: 1px solid #2a3a5a;
+        box-shadow: 0 2px 12px rgba(0,0,0,0.3);
+        transition: all 0.2s ease;
+    }
+
+    /* Widget Labels */
+    [data-testid="stSidebar"] label {
+        color: #a3b3cc !important;
+        font-weight: 600;
+    }
+
+    /* Widget Values */
+    [data-testid="stSidebar"] .stTextInput input,
+    [data-testid="stSidebar"] .stSelectbox div,
+    [data-testid="stSidebar"] .stRadio label,
+    [data-testid="stSidebar"] .stMultiselect label,
+    [data-testid="stSidebar"] .stDateInput label {
+        color: #e0e7ff !important;
+    }
+
+    /* Widget Hover Effects */
+    [data-testid="stSidebar"] .stSelectbox:hover,
+    [data-testid="stSidebar"] .stMultiselect:hover,
+    [data-testid="stSidebar"] .stRadio:hover,
+    [data-testid="stSidebar"] .stDateInput:hover {
+        background-color: rgba(30, 38, 70, 0.9);
+        box-shadow: 0 4px 16px rgba(0,0,0,0.4);
+        border-color: #3a4a7a;
+    }
+
+    /* Metric Cards - Glassmorphism Effect */
+    .metric-card {
+        background: rgba(30, 30, 60, 0.4);
+        backdrop-filter: blur(10px);
+        border-radius: 12px;
+        padding: 20px;
+        box-shadow: 0 4px 20px rgba(0,0,0,0.3);
+        border: 1px solid rgba(100, 100, 200, 0.2);
+        transition: all 0.3s ease;
+    }
+
+    .metric-card h3 {
+        color: #ffffff !important;
+        margin-top: 0;
+        font-size: 1.2rem;
+    }
+
+    .metric-card p {
+        color: #a3b3cc !important;
+        margin-bottom: 0;
+    }
+
+    .metric-card:hover {
+        transform: translateY(-5px);
+        box-shadow: 0 8px 25px rgba(0,0,0,0.5);
+        background: rgba(40, 40, 80, 0.5);
+        border-color: rgba(120, 120, 220, 0.3);
+    }
+
+    /* Header Container */
+    .header-container {
+        background: rgba(20, 25, 45, 0.6);
+        backdrop-filter: blur(5px);
+        padding: 20px;
+        border-radius: 10px;
+        margin-bottom: 20px;
+        border: 1px solid rgba(80, 90, 150, 0.3);
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+    }
+
+    .header-container h3 {
+        color: #ffffff !important;
+        margin-top: 0;
+    }
+
+    .header-container p {
+        color: #a3b3cc !important;
+        margin-bottom: 0;
+    }
+
+    /* Footer Styling */
+    .footer {
+        color: #a3b3cc !important;
+    }
+
+    /* Metric Values */
+    .stMetric {
+        color: #ffffff !important;
+        font-weight: 700;
+        font-size: 1.5rem !important;
+        text-shadow: 0 0 10px rgba(100, 150, 255, 0.5);
+    }
+
+    /* Metric Labels */
+    .stMetricLabel {
+        color: #a3b3cc !important;
+        font-size: 0.9rem !important;
+        font-weight: 600;
+    }
+
+    /* Help Text */
+    .stHelp {
+        color: #7987a5 !important;
+    }
+
+    /* Buttons */
+    .stButton>button {
+        background: linear-gradient(145deg, #3a3a8a, #2a2a6a) !important;
+        color: white !important;
+        border: none !important;
+        box-shadow: 0 4px 8px rgba(0,0,0,0.3) !important;
+        transition: all 0.3s ease !important;
+    }
+    
+    .stButton>button:hover {
+        background: linear-gradient(145deg, #4a4a9a, #3a3a7a) !important;
+        transform: translateY(-2px);
+        box-shadow: 0 6px 12px rgba(0,0,0,0.4) !important;
+    }
+
+    /* Tabs Styling */
+    .stTabs [role="tablist"] {
+        background: rgba(20, 25, 45, 0.6) !important;
+        border-radius: 8px;
+        padding: 5px;
+        margin-bottom: 1rem;
+    }
+    
+    .stTabs [role="tab"] {
+        background: transparent !important;
+        color: #a3b3cc !important;
+        border: none !important;
+        border-radius: 5px;
+        transition: all 0.3s ease;
+    }
+    
+    .stTabs [role="tab"][aria-selected="true"] {
+        background: linear-gradient(145deg, #3a3a8a, #2a2a6a) !important;
+        color: white !important;
+        font-weight: 600;
+        box-shadow: 0 2px 6px rgba(0,0,0,0.3);
+    }
+    
+    .stTabs [role="tab"]:hover {
+        background: rgba(40, 40, 80, 0.4) !important;
+        color: #ffffff !important;
+    }
+
+    /* Data Table Styling */
+    .stDataFrame {
+        background: rgba(20, 25, 45, 0.6) !important;
+        border-radius: 10px;
+        border: 1px solid rgba(80, 90, 150, 0.3) !important;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+    }
+    
+    .stDataFrame th {
+        background: rgba(30, 35, 60, 0.8) !important;
+        color: #ffffff !important;
+    }
+    
+    .stDataFrame td {
+        background: rgba(25, 30, 50, 0.6) !important;
+        color: #e0e7ff !important;
+    }
+    
+    .stDataFrame tr:hover {
+        background: rgba(40, 45, 75, 0.7) !important;
+    }
+
+    /* Responsive Adjustments */
+    @media (max-width: 768px) {
+        [data-testid="stSidebar"] {
+            background: linear-gradient(180deg, #1a1a2e 0%, #16213e 100%) !important;
+        }
+        
+        .metric-card {
+            padding: 16px;
+        }
+    }
+
+    /* Smooth Scrollbar */
+    [data-testid="stSidebar"]::-webkit-scrollbar {
+        width: 8px;
+    }
+    
+    [data-testid="stSidebar"]::-webkit-scrollbar-track {
+        background: #0f1320;
+    }
+    
+    [data-testid="stSidebar"]::-webkit-scrollbar-thumb {
+        background: #3a4a7a;
+        border-radius: 4px;
+    }
+    
+    [data-testid="stSidebar"]::-webkit-scrollbar-thumb:hover {
+        background: #4a5a8a;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+st.markdown(f"""
+<div class="header-container">
+    <h3>Stage timings</h3>
+    <p>Durations and row counts of the last {TIMING_HISTORY:,} pipeline and page stages
+    recorded by this server process, across all sessions.</p>
+</div>
+""", unsafe_allow_html=True)
+
+timings = RECORDER.frame()
+
+# Sidebar Filters
+st.sidebar.header("Filter Options")
+pages = sorted(timings['page'].dropna().unique())
+selected_pages = st.sidebar.multiselect(
+    "Pages",
+    options=pages,
+    default=pages,
+    help="Stages run inside cached loaders are tagged with the page that triggered them"
+)
+if st.sidebar.button("Clear timings"):
+    RECORDER.clear()
+    st.rerun()
+
+if timings.empty:
+    st.info("No timings recorded yet. Open the Trend Analysis or Data Explorer page first.")
+    st.stop()
+
+if selected_pages:
+    timings = timings[timings['page'].isin(selected_pages) | timings['page'].isna()]
+runs = run_summary(timings)
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Recorded Stages", f"{len(timings):,}")
+with col2:
+    st.metric("Reruns", f"{len(runs):,}")
+with col3:
+    st.metric("Slowest Rerun", f"{runs['Span ms'].max():,.0f} ms" if not runs.empty else "N/A")
+
+# Percentiles per stage
+st.subheader("⏱️ Stage Percentiles")
+percentiles = stage_percentiles(timings)
+fig = px.bar(
+    percentiles.sort_values('p90 ms'),
+    x='p90 ms',
+    y='Stage',
+    orientation='h',
+    hover_data=['Count', 'p50 ms', 'p99 ms', 'Max ms'],
+    title="p90 Duration by Stage",
+    height=max(300, 28 * len(percentiles)),
+    template='plotly_dark'  # Use dark theme for plotly
+)
+fig.update_layout(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#e0e7ff')
+)
+st.plotly_chart(fig, use_container_width=True)
+st.dataframe(
+    percentiles.style.format({
+        'p50 ms': '{:,.2f}',
+        'p90 ms': '{:,.2f}',
+        'p99 ms': '{:,.2f}',
+        'Max ms': '{:,.2f}',
+        'Mean rows': '{:,.0f}'
+    }, na_rep='-'),
+    use_container_width=True,
+    hide_index=True
+)
+
+# Recent reruns
+st.subheader("🔁 Recent Reruns")
+st.dataframe(
+    runs.head(50).style.format({'Span ms': '{:,.1f}'}),
+    use_container_width=True,
+    hide_index=True
+)
+
+with st.expander("👁️ Raw Timings", expanded=False):
+    recent = timings.tail(200).iloc[::-1].assign(start=lambda t: pd.to_datetime(t['start'], unit='s'))
+    st.dataframe(recent, use_container_width=True, hide_index=True)
+
+# Footer
+st.markdown("---")
+st.markdown("""
+<small style="color: #a3b3cc;">
+    💡 Tip: set COVID_TIMING_LOG=1 before starting the app to also write every stage as a JSON log line.
+</small>
+""", unsafe_allow_html=True)
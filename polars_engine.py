@@ -0,0 +1,194 @@
+# polars_engine.py
+"""Optional Polars query engine: lazy, multi-threaded filters and aggregations"""
+import os
+from datetime import date
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import data_core
+
+try:
+    import polars as pl
+except ImportError:  # optional engine; the pandas path needs nothing extra
+    pl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+
+class PolarsEngine:
+    """Cleaned dataset as a Polars LazyFrame; queries run on Polars' thread pool
+
+    The source may be a pandas frame such as a Dataset view (copied into
+    Polars once), an Arrow IPC file such as an ingest.py dataset
+    (memory-mapped once, so only the pages a query touches are read), a
+    Parquet file, or the source CSV or snapshot directory (cleaned once by
+    load_frame). Files are read when the engine is built, never again: a
+    cache or dataset rewritten later cannot change or break a running
+    engine. Results are collected and converted to pandas only on return,
+    with the same order, index labels and dtypes as the data_core functions.
+    POLARS_MAX_THREADS caps the threads used; by default every core is.
+    """
+
+    name = 'polars'
+
+    def __init__(self, source: Union[str, pd.DataFrame]):
+        if pl is None:
+            raise ImportError("The Polars engine requires the polars package")
+        self._lazy = self._scan(source).with_row_index('_row')
+        schema = self._lazy.collect_schema()
+        self.columns = [col for col in schema.names() if col != '_row']
+        self._dtypes = self._lazy.head(0).collect().to_pandas().dtypes.to_dict()
+        self._dtypes.pop('_row')
+        self._dtypes['Date'] = np.dtype('datetime64[ns]')
+        states = self._lazy.select(pl.col('State').cast(pl.String).unique().sort()).collect()
+        self._dtypes['State'] = pd.CategoricalDtype(states['State'].to_list())
+
+    @staticmethod
+    def _scan(source: Union[str, pd.DataFrame]) -> 'pl.LazyFrame':
+        """LazyFrame over a snapshot of the cleaned rows of `source`, in load_frame order"""
+        if isinstance(source, pd.DataFrame):
+            return pl.from_pandas(source).lazy()
+        extension = os.path.splitext(source)[1].lower()
+        if extension == '.parquet':
+            return pl.read_parquet(source).lazy()
+        if extension == '.csv' or data_core.is_snapshot_source(source):
+            return pl.from_pandas(data_core.load_frame(source)).lazy()
+        if pa is None:
+            raise ImportError("Reading Arrow files requires pyarrow")
+        table = pa_ipc.open_file(pa.memory_map(source, 'r')).read_all()
+        return pl.from_arrow(table, rechunk=False).lazy()
+
+    def _where(self, states: List[str] = None, date_range: Tuple[date, date] = None,
+               positive_range: Tuple[int, int] = None) -> 'pl.LazyFrame':
+        """Rows matching filter_data's state, date and positive conditions"""
+        lazy = self._lazy
+        if states and len(states) > 0:
+            lazy = lazy.filter(pl.col('State').cast(pl.String).is_in(list(states)))
+        if date_range and len(date_range) == 2:
+            start, end = (pd.Timestamp(d).to_pydatetime() for d in date_range)
+            lazy = lazy.filter(pl.col('Date').is_between(start, end))
+        if positive_range and 'Positive' in self.columns:
+            lazy = lazy.filter(pl.col('Positive').is_between(*(int(v) for v in positive_range)))
+        return lazy
+
+    def filter_data(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        """Rows like data_core.filter_data: State ascending, Date descending"""
+        rows = (
+            self._where(states, date_range, positive_range)
+            .sort([pl.col('State').cast(pl.String), 'Date'], descending=[False, True])
+            .collect()
+            .to_pandas()
+        )
+        index = pd.Index(rows.pop('_row').to_numpy(dtype=np.int64))
+        return rows.astype(self._dtypes).set_axis(index, axis=0)
+
+    def aggregate_by_state(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None,
+        metric: str = 'TotalSamples'
+    ) -> pd.DataFrame:
+        """Total, Average, Peak and Latest of `metric` per state, as aggregate_by_state"""
+        if metric not in self.columns or metric in ('State', 'Date'):
+            raise ValueError(f"Unknown metric: {metric}")
+        value = pl.col(metric).cast(pl.Float64)
+        agg_df = (
+            self._where(states, date_range)
+            .group_by(pl.col('State').cast(pl.String))
+            .agg(
+                value.sum().alias('Total'),
+                value.mean().alias('Average'),
+                value.max().alias('Peak'),
+                value.sort_by('Date').last().alias('Latest')
+            )
+            .sort('State')
+            .collect()
+            .to_pandas()
+        )
+        if agg_df.empty:
+            return pd.DataFrame(columns=data_core.AGGREGATE_COLUMNS)
+        if pd.api.types.is_integer_dtype(self._dtypes[metric]):
+            agg_df = agg_df.astype({'Total': np.int64, 'Peak': np.int64, 'Latest': np.int64})
+        return agg_df.astype({'State': object})
+
+    def aggregate_by_month(
+        self,
+        state: str,
+        date_range: Tuple[date, date] = None,
+        positive_range: Tuple[int, int] = None
+    ) -> pd.DataFrame:
+        """Monthly sums and PositiveRatio for one state, as aggregate_by_month"""
+        columns = ['TotalSamples', 'Positive', 'Negative']
+        monthly_stats = (
+            self._where([state], date_range, positive_range)
+            .group_by(pl.col('Date').dt.strftime('%Y-%m').alias('Month'))
+            .agg(pl.col(col).cast(pl.Int64).sum() for col in columns)
+            .sort('Month')
+            .collect()
+            .to_pandas()
+        )
+        if monthly_stats.empty:
+            return pd.DataFrame(columns=['Month'] + columns + ['PositiveRatio'])
+        monthly_stats['Month'] = monthly_stats['Month'].astype(object)
+        monthly_stats['PositiveRatio'] = monthly_stats['Positive'] / monthly_stats['TotalSamples']
+        return monthly_stats
+
+    def summary(
+        self,
+        states: List[str] = None,
+        date_range: Tuple[date, date] = None
+    ) -> Dict[str, Any]:
+        """The get_data_summary dictionary, computed in one lazy query"""
+        lazy = self._where(states, date_range)
+        totals, peak, highest = pl.collect_all([
+            lazy.select(
+                pl.len().alias('records'),
+                pl.col('State').n_unique().alias('states'),
+                pl.col('Date').min().alias('start'),
+                pl.col('Date').max().alias('end'),
+                *(pl.col(col).cast(pl.Int64).sum().alias(col)
+                  for col in ('TotalSamples', 'Positive', 'Negative')),
+                pl.col('PositiveRatio').cast(pl.Float64).mean().alias('ratio')
+            ),
+            # First row holding the maximum, as idxmax picks it
+            lazy.sort('_row').select(
+                pl.col('Date', 'Positive', 'State').get(pl.col('Positive').arg_max())
+            ),
+            lazy.group_by(pl.col('State').cast(pl.String))
+                .agg(pl.col('PositiveRatio').cast(pl.Float64).mean())
+                .sort(['PositiveRatio', 'State'], descending=[True, False])
+                .head(3)
+        ])
+        totals = totals.row(0, named=True)
+        if not totals['records']:
+            return {}
+        peak = peak.row(0, named=True)
+        return {
+            'total_records': totals['records'],
+            'total_states': totals['states'],
+            'date_range': {
+                'start': totals['start'].strftime('%Y-%m-%d'),
+                'end': totals['end'].strftime('%Y-%m-%d')
+            },
+            'total_samples': int(totals['TotalSamples']),
+            'total_positive': int(totals['Positive']),
+            'total_negative': int(totals['Negative']),
+            'avg_positive_ratio': float(totals['ratio']),
+            'peak_positive_day': {
+                'date': peak['Date'].strftime('%Y-%m-%d'),
+                'value': int(peak['Positive']),
+                'state': str(peak['State'])
+            },
+            'states_with_highest_positivity': dict(highest.iter_rows())
+        }
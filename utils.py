@@ -1,214 +1,167 @@
 # utils.py (Complete Version)
+"""Streamlit layer over data_core: caching, shared resources and user messages"""
+import os
 import pandas as pd
 import streamlit as st
-import numpy as np
-from datetime import date, datetime
-from typing import Tuple, List, Dict, Any
+from datetime import date
+from typing import Tuple, List, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
-@st.cache_data(ttl=3600)
-def load_data() -> pd.DataFrame:
-    """Load and preprocess COVID-19 testing data with comprehensive cleaning"""
+import data_core
+from data_core import (  # noqa: F401  (re-exported for the pages)
+    DATA_FILE, NUMERIC_COLUMNS, DERIVED_METRICS, BULK_EXPORT_FORMATS, FIGURE_CACHE_SIZE,
+    FIGURE_CACHE_BYTES, Dataset, PandasEngine, StateIndex, RollupCube, MetricStore, LRUCache,
+    load_frame, map_dataset, dataset_key, aggregate_by_state, aggregate_by_month, with_metric,
+    downsample_series, figure_cache_key, serialize_export, bulk_export_file,
+    state_stats, QUALITY_FLAGS, filter_quality, quality_labels, get_data_summary,
+    create_sample_data
+)
+from duckdb_engine import DuckDBEngine
+from polars_engine import PolarsEngine
+from manifest import ARROW_DATASET_ENV, DATA_SOURCE_ENV
+
+# Query engine used by the pages: 'pandas' (default), 'duckdb' or 'polars'
+QUERY_ENGINE_ENV = 'COVID_QUERY_ENGINE'
+
+
+def data_source() -> str:
+    """CSV, snapshot directory or glob to load: COVID_DATA_SOURCE or the bundled CSV"""
+    return os.environ.get(DATA_SOURCE_ENV) or DATA_FILE
+
+
+# name -> factory building the engine over the shared Dataset. Every engine
+# reads the Dataset's own rows, so its row labels always match the Dataset:
+# DuckDB scans the pandas columns in place, Polars copies them once.
+QUERY_ENGINES = {
+    'pandas': PandasEngine,
+    'duckdb': lambda dataset: DuckDBEngine(dataset.view()),
+    'polars': lambda dataset: PolarsEngine(dataset.view()),
+}
+
+
+def _arrow_dataset() -> Optional[Tuple[str, int]]:
+    """(path, mtime) of the Arrow dataset published by ingest.py, if one is configured"""
+    path = os.environ.get(ARROW_DATASET_ENV)
+    return (path, os.stat(path).st_mtime_ns) if path else None
+
+
+@st.cache_resource(ttl=3600, max_entries=1, show_spinner=False)
+def _shared_dataset(arrow_file: Optional[Tuple[str, int]] = None) -> Dataset:
+    """The one read-only dataset of this process; raises instead of reporting
+
+    With an Arrow dataset configured its file is memory-mapped instead of
+    parsing the CSV; its mtime is part of the key, so a new ingest is picked
+    up on the next rerun.
+    """
+    if arrow_file is not None:
+        return Dataset(map_dataset(arrow_file[0]))
+    return Dataset(load_frame(data_source()))
+
+
+def load_dataset() -> Optional[Dataset]:
+    """Process-wide read-only dataset shared by every session, or None if loading failed"""
     try:
-        # Read CSV with explicit NA values handling
-        df = pd.read_csv(
-            "StatewiseTestingDetails.csv",
-            na_values=['', 'None', 'none', 'NONE',
-                       'null', 'NULL', 'NaN', 'nan', ' ', '-', 'NA'],
-            keep_default_na=True,
-            encoding='utf-8'
-        )
-        
-        # Standardize column names
-        df.columns = df.columns.str.strip().str.replace(' ', '').str.replace('-', '')
-        
-        # Rename columns to standard format
-        column_mapping = {
-            'State': 'State',
-            'Date': 'Date',
-            'TotalSamples': 'TotalSamples',
-            'Negative': 'Negative',
-            'Positive': 'Positive',
-            'positive': 'Positive',
-            'negative': 'Negative',
-            'totalsamples': 'TotalSamples',
-            'state': 'State',
-            'date': 'Date',
-            'total': 'TotalSamples'
-        }
-        
-        df = df.rename(columns={col: column_mapping.get(col, col) for col in df.columns})
-        
-        # Ensure required columns exist
-        required_columns = ['State', 'Date', 'TotalSamples', 'Negative', 'Positive']
-        for col in required_columns:
-            if col not in df.columns:
-                # Try to find similar columns
-                possible_matches = [c for c in df.columns if col.lower() in c.lower()]
-                if possible_matches:
-                    df = df.rename(columns={possible_matches[0]: col})
-                else:
-                    # Create placeholder column if missing
-                    df[col] = np.nan
-        
-        # Convert date column with error handling
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            # Drop rows with invalid dates
-            df = df.dropna(subset=['Date'])
-            # Convert to date only
-            df['Date'] = df['Date'].dt.date
-        
-        # Clean State names
-        if 'State' in df.columns:
-            df['State'] = df['State'].astype(str).str.strip().str.title()
-            # Remove invalid state names
-            invalid_states = ['Nan', 'Na', 'None', 'Null', '', ' ', 'Unknown', 'Unspecified']
-            df = df[~df['State'].isin(invalid_states)]
-        
-        # Process numeric columns
-        numeric_cols = ['TotalSamples', 'Negative', 'Positive']
-        for col in numeric_cols:
-            if col in df.columns:
-                # Convert to string first to handle various formats
-                df[col] = df[col].astype(str)
-                # Remove commas, spaces, and other non-numeric characters
-                df[col] = df[col].str.replace(',', '').str.replace(' ', '')
-                # Convert to numeric, forcing errors to NaN
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                # Replace negative values with 0
-                df[col] = df[col].clip(lower=0)
-                # Fill NaN with 0 for counts
-                df[col] = df[col].fillna(0).astype(int)
-        
-        # Calculate PositiveRatio safely
-        if all(col in df.columns for col in ['Positive', 'TotalSamples']):
-            df['PositiveRatio'] = np.where(
-                (df['TotalSamples'] > 0) & (df['Positive'].notna()),
-                df['Positive'] / df['TotalSamples'],
-                0
-            ).round(4)
-        
-        # Remove duplicates (same state and date)
-        df = df.drop_duplicates(subset=['State', 'Date'], keep='last')
-        
-        # Sort by date and state
-        df = df.sort_values(['State', 'Date'])
-        
-        # Reset index
-        df = df.reset_index(drop=True)
-        
-        # Log success
-        st.success(f"✅ Data loaded successfully: {len(df)} records, {df['State'].nunique()} states")
-        
-        return df
-        
-    except FileNotFoundError:
-        st.error("❌ Data file 'StatewiseTestingDetails.csv' not found!")
-        st.info("📁 Please ensure the CSV file is in the same directory as the app.")
-        return pd.DataFrame()
+        dataset = _shared_dataset(_arrow_dataset())
+    except FileNotFoundError as e:
+        st.error(f"❌ Data file '{os.path.basename(e.filename or data_source())}' not found!")
+        if os.environ.get(ARROW_DATASET_ENV):
+            st.info(f"📁 Run `python ingest.py` to publish the dataset set in {ARROW_DATASET_ENV}.")
+        else:
+            st.info("📁 Please ensure the CSV file is in the same directory as the app.")
+        return None
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
-        return pd.DataFrame()
+        return None
+
+    # Log success once per session rather than on every cache hit
+    if not st.session_state.get('data_load_reported'):
+        st.session_state['data_load_reported'] = True
+        st.success(f"✅ Data loaded successfully: {len(dataset)} records, {len(dataset.index.states())} states")
+    return dataset
+
+
+def load_data() -> pd.DataFrame:
+    """Load and preprocess COVID-19 testing data with comprehensive cleaning"""
+    dataset = load_dataset()
+    return dataset.view() if dataset is not None else pd.DataFrame()
+
+
+@st.cache_resource(ttl=3600, max_entries=1, show_spinner=False)
+def _shared_engine(name: str, version: int, _dataset: Dataset):
+    """Query engine `name` over the shared dataset with Dataset.version `version`"""
+    return QUERY_ENGINES[name](_dataset)
+
+
+def load_query_engine(dataset: Dataset):
+    """Engine selected by COVID_QUERY_ENGINE, falling back to pandas when unavailable"""
+    name = os.environ.get(QUERY_ENGINE_ENV, 'pandas').strip().lower()
+    if name not in QUERY_ENGINES:
+        st.warning(f"⚠️ Unknown query engine '{name}', using pandas.")
+        return PandasEngine(dataset)
+    try:
+        return _shared_engine(name, dataset.version, dataset)
+    except ImportError as e:
+        st.warning(f"⚠️ {e}, using pandas.")
+        return PandasEngine(dataset)
+
 
 def filter_data(
     df: pd.DataFrame,
     states: List[str] = None,
     date_range: Tuple[date, date] = None,
-    positive_range: Tuple[int, int] = None
+    positive_range: Tuple[int, int] = None,
+    index: Optional[StateIndex] = None
 ) -> pd.DataFrame:
-    """Filter data by states, date range, and positive cases range"""
+    """data_core.filter_data, reporting failures on the page instead of raising"""
     try:
-        if df.empty:
-            return pd.DataFrame()
-        
-        filtered_df = df.copy()
-        
-        # Filter by states
-        if states and len(states) > 0:
-            filtered_df = filtered_df[filtered_df['State'].isin(states)]
-        
-        # Filter by date range
-        if date_range and len(date_range) == 2:
-            start_date, end_date = date_range
-            filtered_df = filtered_df[
-                (filtered_df['Date'] >= start_date) & 
-                (filtered_df['Date'] <= end_date)
-            ]
-        
-        # Filter by positive range
-        if positive_range and 'Positive' in filtered_df.columns:
-            min_positive, max_positive = positive_range
-            filtered_df = filtered_df[
-                (filtered_df['Positive'] >= min_positive) &
-                (filtered_df['Positive'] <= max_positive)
-            ]
-        
-        return filtered_df.sort_values(['State', 'Date'], ascending=[True, False])
-        
+        return data_core.filter_data(df, states, date_range, positive_range, index)
     except Exception as e:
         st.error(f"❌ Filtering error: {str(e)}")
         return pd.DataFrame()
 
-def get_data_summary(df: pd.DataFrame) -> Dict[str, Any]:
-    """Get comprehensive data summary"""
-    if df.empty:
-        return {}
-    
-    summary = {
-        'total_records': len(df),
-        'total_states': df['State'].nunique(),
-        'date_range': {
-            'start': df['Date'].min().strftime('%Y-%m-%d'),
-            'end': df['Date'].max().strftime('%Y-%m-%d')
-        },
-        'total_samples': int(df['TotalSamples'].sum()),
-        'total_positive': int(df['Positive'].sum()),
-        'total_negative': int(df['Negative'].sum()),
-        'avg_positive_ratio': float(df['PositiveRatio'].mean()),
-        'peak_positive_day': {
-            'date': df.loc[df['Positive'].idxmax(), 'Date'].strftime('%Y-%m-%d'),
-            'value': int(df['Positive'].max()),
-            'state': df.loc[df['Positive'].idxmax(), 'State']
-        } if 'Positive' in df.columns else None,
-        'states_with_highest_positivity': df.groupby('State')['PositiveRatio'].mean().nlargest(3).to_dict()
-    }
-    
-    return summary
-
-def create_sample_data() -> pd.DataFrame:
-    """Create sample COVID-19 testing data for demo purposes"""
-    dates = pd.date_range(start='2020-01-01', end='2021-12-31', freq='D')
-    states = [
-        'Maharashtra', 'Delhi', 'Kerala', 'Karnataka', 'Tamil Nadu',
-        'Uttar Pradesh', 'Gujarat', 'Rajasthan', 'Madhya Pradesh', 'West Bengal',
-        'Bihar', 'Andhra Pradesh', 'Telangana', 'Assam', 'Odisha',
-        'Punjab', 'Chhattisgarh', 'Haryana', 'Jharkhand', 'Uttarakhand'
-    ]
-    
-    data = []
-    for date in dates:
-        for state in states:
-            # Base values with some randomness
-            base_samples = np.random.randint(1000, 5000)
-            # Add seasonality and trends
-            month_factor = 1 + (date.month - 1) * 0.1  # Increase over months
-            state_factor = 0.5 + (states.index(state) % 10) * 0.1
-            
-            total_samples = int(base_samples * month_factor * state_factor)
-            positive_rate = 0.01 + (np.sin(date.month * 0.5) * 0.005)  # Seasonal variation
-            positive = int(total_samples * positive_rate)
-            negative = total_samples - positive
-            
-            data.append({
-                'State': state,
-                'Date': date.date(),
-                'TotalSamples': total_samples,
-                'Positive': positive,
-                'Negative': negative,
-                'PositiveRatio': positive / total_samples
-            })
-    
-    df = pd.DataFrame(data)
-    return df
+
+@st.cache_resource
+def load_figure_cache() -> LRUCache:
+    """Figure specs shared by every session, so popular views are built once"""
+    return LRUCache(FIGURE_CACHE_SIZE, FIGURE_CACHE_BYTES)
+
+
+def _filtered_rows(states: List[str], date_range: Tuple[date, date],
+                   positive_range: Optional[Tuple[int, int]] = None,
+                   quality: Optional[Tuple[str, Tuple[str, ...]]] = None) -> pd.DataFrame:
+    """Rows of the shared dataset matching a Data Explorer filter
+
+    `quality` is a (mode, flag names) pair for filter_quality.
+    """
+    dataset = _shared_dataset(_arrow_dataset())
+    rows = data_core.filter_data(dataset.view(), states, date_range, positive_range,
+                                 dataset.index)
+    if quality is not None:
+        rows = filter_quality(rows, quality[0], list(quality[1]))
+    return rows
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def filter_stats(version: int, states: Tuple[str, ...], date_range: Tuple[date, date],
+                 positive_range: Optional[Tuple[int, int]] = None,
+                 quality: Optional[Tuple[str, Tuple[str, ...]]] = None) -> pd.DataFrame:
+    """state_stats of one filter, computed once and shared by everything showing it
+
+    `version` is the Dataset.version the filter applies to, so a reload
+    misses the cache instead of serving stats of the previous data.
+    """
+    return state_stats(_filtered_rows(list(states), date_range, positive_range, quality))
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def export_payload(fmt: str, version: int, state: str, date_range: Tuple[date, date],
+                   positive_range: Optional[Tuple[int, int]] = None,
+                   quality: Optional[Tuple[str, Tuple[str, ...]]] = None) -> bytes:
+    """Download payload for one Data Explorer filter of Dataset.version `version`"""
+    if fmt == 'stats':
+        # Read off the same cached stats as the Explorer's Quick Statistics
+        stats = filter_stats(version, (state,), date_range, positive_range, quality)
+        return serialize_export(None, fmt, state, date_range, stats=stats)
+    rows = _filtered_rows([state], date_range, positive_range, quality)
+    return serialize_export(rows, fmt, state, date_range)